@@ -1,10 +1,22 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
-import io
 from datetime import datetime
 from urllib.parse import quote
+import hashlib
 import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dataset_store import PartitionStore, account_key
+from perf_metrics import Metrics, serve_http
+from report_export import build_report, export_path
+from search_index import CustomerIndex
+from status_store import export_xlsx, open_status_store
+from upload_log import UploadLog, import_xlsx_log
 
 # ----------------- BASIC CONFIG -----------------
 st.set_page_config(
@@ -13,8 +25,39 @@ st.set_page_config(
 )
 
 STATUS_FILE = "tip_contact_status.xlsx"   # TIP call / WhatsApp log (month-wise sheets)
-UPLOAD_LOG_FILE = "bbm_upload_log.xlsx"   # BBM file upload log
+STATUS_DB_FILE = "tip_contact_status.db"  # same log, SQLite (WAL) backend
+STATUS_BACKEND = os.environ.get("TIPOS_STATUS_BACKEND", "sqlite").strip().lower()
+UPLOAD_LOG_FILE = "bbm_upload_log.jsonl"  # BBM file upload log (append-only)
+LEGACY_UPLOAD_LOG_FILE = "bbm_upload_log.xlsx"  # old log, imported once
+DATA_ROOT = "monthly_data"                  # per-month, per-BBM partitions + manifest.json
+OS_LATEST_FILE = "Outstanding_latest.xlsx"  # legacy single-file store (imported once)
+OG_LATEST_FILE = "Barred_latest.xlsx"
 CURRENT_MONTH = datetime.now().strftime("%Y-%m")  # e.g. 2025-12
+HISTORY_MONTHS = int(os.environ.get("TIPOS_HISTORY_MONTHS", "6"))  # contact cadence window
+
+# ----------------- PERFORMANCE METRICS -----------------
+# Stage timings + counters for the whole server process (see perf_metrics.py).
+# TIPOS_METRICS=0 turns collection and the MGMT diagnostics panel off;
+# TIPOS_METRICS_FILE / TIPOS_METRICS_PORT export them in Prometheus format.
+METRICS_ENABLED = os.environ.get("TIPOS_METRICS", "1").strip() != "0"
+METRICS_FILE = os.environ.get("TIPOS_METRICS_FILE", "").strip()
+METRICS_PORT = os.environ.get("TIPOS_METRICS_PORT", "").strip()
+
+
+@st.cache_resource(show_spinner=False)
+def get_metrics():
+    m = Metrics(enabled=METRICS_ENABLED)
+    if METRICS_ENABLED and METRICS_PORT:
+        try:
+            serve_http(m, int(METRICS_PORT))
+        except Exception as e:
+            st.warning(f"Could not start metrics endpoint on port {METRICS_PORT}: {e}")
+    return m
+
+
+metrics = get_metrics()
+metrics.inc("reruns")
+_script_started = time.perf_counter()
 
 # ----------------- PAYMENT LINK CONFIG -----------------
 # Official portal (keep as default)
@@ -74,6 +117,12 @@ COL_OG_CUST_NAME = "Customer Name"
 COL_OG_ADDR = "ADDRESS"
 COL_OG_AMOUNT = "OutStanding"
 
+SOURCE_COLS = {
+    # source: (account, customer name, address, mobile, amount)
+    "OS": (COL_OS_BA, COL_OS_CUST_NAME, COL_OS_ADDR, COL_OS_MOBILE, COL_OS_AMOUNT),
+    "OG": (COL_OG_BA, COL_OG_CUST_NAME, COL_OG_ADDR, COL_OG_MOBILE, COL_OG_AMOUNT),
+}
+
 # ----------------- SESSION INIT -----------------
 def init_session():
     defaults = {
@@ -81,15 +130,20 @@ def init_session():
         "role": None,          # "TIP" or "BBM" or "MGMT"
         "username": None,
         "current_bbm": "",
-        "os_df": None,
-        "og_df": None,
+        "os_version": "",      # partition fingerprint (dataset_store) in use
+        "og_version": "",
+        "os_upload_id": None,  # last uploader file processed (avoid re-ingest on rerun)
+        "og_upload_id": None,
+        "pending_saves": [],   # [(label, Future)] on the persistence pool
+        "save_results": [],    # [(kind, message)] to show once
         "os_filename": "Not loaded",
         "og_filename": "Not loaded",
         "os_uploaded_at": "",
         "og_uploaded_at": "",
         "os_uploaded_by": "",
         "og_uploaded_by": "",
-        "status_sheets": None,
+        "activity_version": None,  # status store version the BBM feed has seen
+        "tip_activity": [],        # newest-first rows for that feed
     }
     for k, v in defaults.items():
         if k not in st.session_state:
@@ -117,197 +171,189 @@ def _safe_sheet_name(name: str, fallback: str = "Sheet1") -> str:
     return s or fallback
 
 
-def df_to_excel_bytes(df, sheet_name="Sheet1"):
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-        safe_name = _safe_sheet_name(sheet_name)
-        df.to_excel(writer, index=False, sheet_name=safe_name)
-    buffer.seek(0)
-    return buffer.getvalue()
-
-def make_tel_link(mobile):
-    if not mobile:
-        return ""
-    return f'<a href="tel:{mobile}">📞 {mobile}</a>'
-
-def make_whatsapp_link(mobile, message):
-    if not mobile:
-        return ""
-    return f'<a href="https://wa.me/{mobile}?text={quote(message)}" target="_blank">🟢 WhatsApp</a>'
-
 def get_pay_link():
     s = str(PAY_LINK_SHORT).strip()
     return s if s else PAY_LINK_LONG
 
-def build_wa_message(cust_name, amount, acc_no, ftth_no=""):
-    """Bilingual WhatsApp message: English + Telugu + Hindi. Includes Account No and optional FTTH No."""
+def build_contact_columns(df, source):
+    """Add WA_MESSAGE, the trilingual (English / Telugu / Hindi) WhatsApp
+    reminder with account no., optional FTTH no., amount and pay link.
+
+    Built vectorised once per dataset version via the shared preprocess
+    cache. Only the message is stored: the wa.me / tel: links and the card
+    HTML are derived from it for the rows actually shown (contact_links,
+    card_bodies), so the shared frames do not carry them for every customer.
+    """
+    col_ba, col_name, col_addr, col_mobile, col_amount = SOURCE_COLS[source]
+    if df.empty:
+        df["WA_MESSAGE"] = pd.Series(dtype=object)
+        return df
+
     link = get_pay_link()
-    cust_name = str(cust_name).strip() if cust_name is not None else "Customer"
-    acc_no = str(acc_no).strip() if acc_no is not None else ""
-    ftth_no = str(ftth_no).strip() if ftth_no is not None else ""
-
-    ftth_line_en = f"FTTH No: {ftth_no}\n" if ftth_no else ""
-    ftth_line_te = f"FTTH నెం: {ftth_no}\n" if ftth_no else ""
-    ftth_line_hi = f"FTTH नं: {ftth_no}\n" if ftth_no else ""
-
-    msg = (
-        f"Dear {cust_name}, your BSNL FTTH bill is overdue.\n"
-        f"Account No: {acc_no}\n"
-        f"{ftth_line_en}"
-        f"Outstanding Rs {float(amount):.2f}.\n"
-        f"Pay online: {link}\n\n"
-        f"తెలుగు: ప్రియమైన {cust_name}, మీ BSNL FTTH బిల్లు బాకీగా ఉంది.\n"
-        f"అకౌంట్ నెం: {acc_no}\n"
-        f"{ftth_line_te}"
-        f"బాకీ మొత్తం రూ {float(amount):.2f}.\n"
-        f"ఆన్‌లైన్ చెల్లింపు: {link}\n\n"
-        f"हिंदी: प्रिय {cust_name}, आपका BSNL FTTH बिल बकाया है।\n"
-        f"Account No: {acc_no}\n"
-        f"{ftth_line_hi}"
-        f"बकाया राशि Rs {float(amount):.2f}।\n"
-        f"Online payment: {link}"
+    name = df[col_name].map(str).str.strip()
+    acc = df[col_ba].map(str).str.strip()
+    ftth = df["FTTH_NO"].map(str).str.strip() if "FTTH_NO" in df.columns else pd.Series("", index=df.index)
+    has_ftth = ftth != ""
+    amt = pd.to_numeric(df[col_amount], errors="coerce").fillna(0).map("{:.2f}".format)
+
+    df["WA_MESSAGE"] = (
+        "Dear " + name + ", your BSNL FTTH bill is overdue.\n"
+        + "Account No: " + acc + "\n"
+        + ("FTTH No: " + ftth + "\n").where(has_ftth, "")
+        + "Outstanding Rs " + amt + ".\n"
+        + f"Pay online: {link}\n\n"
+        + "తెలుగు: ప్రియమైన " + name + ", మీ BSNL FTTH బిల్లు బాకీగా ఉంది.\n"
+        + "అకౌంట్ నెం: " + acc + "\n"
+        + ("FTTH నెం: " + ftth + "\n").where(has_ftth, "")
+        + "బాకీ మొత్తం రూ " + amt + ".\n"
+        + f"ఆన్‌లైన్ చెల్లింపు: {link}\n\n"
+        + "हिंदी: प्रिय " + name + ", आपका BSNL FTTH बिल बकाया है।\n"
+        + "Account No: " + acc + "\n"
+        + ("FTTH नं: " + ftth + "\n").where(has_ftth, "")
+        + "बकाया राशि Rs " + amt + "।\n"
+        + f"Online payment: {link}"
+    )
+    return df
+
+def contact_links(df, source):
+    """(WA_URL, TEL_URL) Series for df's rows ("" without a mobile number)."""
+    mobile = df[SOURCE_COLS[source][3]].astype(str)
+    has_mobile = mobile != ""
+    wa_url = ("https://wa.me/" + mobile + "?text=" + df["WA_MESSAGE"].astype(str).map(quote)).where(has_mobile, "")
+    tel_url = ("tel:" + mobile).where(has_mobile, "")
+    return wa_url, tel_url
+
+def card_bodies(df, source):
+    """Static middle of each row's customer card (name, account, FTTH,
+    address, amount, call / WhatsApp links); the status-dependent parts are
+    added by customer_card_html."""
+    col_ba, col_name, col_addr, col_mobile, col_amount = SOURCE_COLS[source]
+    mobile = df[col_mobile].astype(str)
+    has_mobile = mobile != ""
+    ftth = df["FTTH_NO"].astype(str)
+    wa_url, tel_url = contact_links(df, source)
+    tel_html = ('<a href="' + tel_url + '">📞 ' + mobile + "</a>").where(has_mobile, "")
+    wa_html = ('<a href="' + wa_url + '" target="_blank">🟢 WhatsApp</a>').where(has_mobile, "")
+    return (
+        "<b>" + df[col_name].astype(str) + "</b> | Acc: " + df[col_ba].astype(str)
+        + ("<br><b>FTTH No:</b> " + ftth).where(ftth != "", "")
+        + "<br>" + df[col_addr].astype(str) + "<br>"
+        + f"{source}: ₹" + df[col_amount].map("{:,.2f}".format) + "<br>"
+        + tel_html + "&nbsp;&nbsp;" + wa_html
     )
-    return msg
 
 # ----------------- STATUS: LOAD / SAVE (MONTH-WISE SHEETS) -----------------
-STATUS_COLS = [
-    "TIP_NAME_STD", "BBM_STD", "SOURCE: OS/OG", "ACCOUNT_NO",
-    "LAST_CALL_TIME", "LAST_WHATSAPP_TIME", "MONTH"
-]
+# Backend is chosen with TIPOS_STATUS_BACKEND: "sqlite" (default, single-row
+# transactional upserts in STATUS_DB_FILE) or "xlsx" (rewrite STATUS_FILE on
+# every click, the old behaviour). A fresh SQLite store imports STATUS_FILE.
+# Months are read on first use. Once per process and month, closed months
+# are rolled over (see status_store): the xlsx backend moves them into the
+# read-only Parquet archive, SQLite keeps them and drops them from memory.
+@st.cache_resource(show_spinner=False)
+def get_status_store():
+    return open_status_store(STATUS_BACKEND, STATUS_FILE, STATUS_DB_FILE)
+
+@st.cache_resource(show_spinner=False)
+def roll_over_status_months(month):
+    try:
+        return get_status_store().roll_over(month)
+    except Exception as e:
+        st.warning(f"Could not roll over closed months of the status log: {e}")
+        return []
 
-def load_status_all():
-    if st.session_state.status_sheets is not None:
-        return st.session_state.status_sheets
-
-    sheets = {}
-    if os.path.exists(STATUS_FILE):
-        xls = pd.ExcelFile(STATUS_FILE)
-        for s in xls.sheet_names:
-            df = pd.read_excel(xls, sheet_name=s, dtype=str)
-            for c in STATUS_COLS:
-                if c not in df.columns:
-                    df[c] = ""
-            sheets[s] = df[STATUS_COLS].copy()
-    st.session_state.status_sheets = sheets
-    return sheets
-
-def save_status_all(sheets_dict):
-    if not sheets_dict:
-        sheets_dict[CURRENT_MONTH] = pd.DataFrame(columns=STATUS_COLS)
-
-    with pd.ExcelWriter(STATUS_FILE, engine="openpyxl") as writer:
-        for sheet_name, df in sheets_dict.items():
-            for c in STATUS_COLS:
-                if c not in df.columns:
-                    df[c] = ""
-            df[STATUS_COLS].to_excel(writer, sheet_name=sheet_name, index=False)
-
-    st.session_state.status_sheets = sheets_dict
+roll_over_status_months(CURRENT_MONTH)
 
-def update_status(tip_name, source, account_no, update_call=False, update_whatsapp=False):
-    tip_name = str(tip_name).upper().strip()
-    account_no = str(account_no).strip()
-    source = source.upper()   # "OS" or "OG"
-    bbm_name = st.session_state.get("current_bbm", "").upper().strip()
-
-    sheets = load_status_all()
-    month_str = CURRENT_MONTH
-
-    if month_str in sheets:
-        df = sheets[month_str].copy()
-        for c in STATUS_COLS:
-            if c not in df.columns:
-                df[c] = ""
-        df = df[STATUS_COLS]
-    else:
-        df = pd.DataFrame(columns=STATUS_COLS)
+def sync_status_store():
+    """Fold in status rows other server processes wrote since the last rerun
+    (one query on the change log; nothing is re-read)."""
+    try:
+        with metrics.stage("status_sync"):
+            return get_status_store().sync()
+    except Exception as e:
+        st.warning(f"Could not refresh the status log: {e}")
+        return None
 
-    now_str = datetime.now().strftime("%Y-%m-%d %H:%M")
+sync_status_store()
 
-    if not df.empty:
-        mask = (
-            (df["TIP_NAME_STD"] == tip_name) &
-            (df["BBM_STD"] == bbm_name) &
-            (df["SOURCE: OS/OG"] == source) &
-            (df["ACCOUNT_NO"] == account_no)
-        )
-    else:
-        mask = pd.Series(False, index=df.index)
-
-    if mask.any():
-        idx = df[mask].index[0]
-        if update_call:
-            df.at[idx, "LAST_CALL_TIME"] = now_str
-        if update_whatsapp:
-            df.at[idx, "LAST_WHATSAPP_TIME"] = now_str
-        df.at[idx, "MONTH"] = month_str
-    else:
-        new_row = {
-            "TIP_NAME_STD": tip_name,
-            "BBM_STD": bbm_name,
-            "SOURCE: OS/OG": source,
-            "ACCOUNT_NO": account_no,
-            "LAST_CALL_TIME": now_str if update_call else "",
-            "LAST_WHATSAPP_TIME": now_str if update_whatsapp else "",
-            "MONTH": month_str,
-        }
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+def update_status(tip_name, source, account_no, update_call=False, update_whatsapp=False):
+    update_status_many(tip_name, source, [account_no], update_call, update_whatsapp)
 
-    sheets[month_str] = df
-    save_status_all(sheets)
+def update_status_many(tip_name, source, account_nos, update_call=False, update_whatsapp=False):
+    """Record a call / WhatsApp for many customers in one transaction.
+    Customers on both the OS and the OG/IC barred list get both rows."""
+    bbm_name = st.session_state.get("current_bbm", "")
+    now_str = datetime.now().strftime("%Y-%m-%d %H:%M")
+    call_time = now_str if update_call else ""
+    wa_time = now_str if update_whatsapp else ""
+    links = session_account_links()[source]
+    other = "OG" if source == "OS" else "OS"
+    rows = []
+    for account_no in account_nos:
+        rows.append((tip_name, bbm_name, source, account_no, CURRENT_MONTH, call_time, wa_time))
+        other_tip = links.get(str(account_no))
+        if other_tip is not None:
+            rows.append((other_tip, bbm_name, other, account_no, CURRENT_MONTH, call_time, wa_time))
+    if not rows:
+        return 0
+
+    with metrics.stage("status_write"):
+        get_status_store().upsert_many(rows)
+    metrics.inc("status_writes", len(rows))
+    return len(rows)
+
+def history_start_month(months=None):
+    """First month of the HISTORY_MONTHS window ending with CURRENT_MONTH."""
+    months = HISTORY_MONTHS if months is None else months
+    return str(pd.Period(CURRENT_MONTH, freq="M") - (months - 1))
+
+def get_contact_history(source, account_nos, months=None):
+    """{account_no: [(month, call_time, wa_time), ...]} over the last `months`
+    months (one indexed query for the whole list)."""
+    with metrics.stage("status_history"):
+        return get_status_store().contact_history(source, account_nos, history_start_month(months))
+
+def contact_cadence(history, months=None):
+    """'Chased 3 of last 6 months · last 2025-12-04 10:15' for one account."""
+    months = HISTORY_MONTHS if months is None else months
+    chased = [(m, call, wa) for m, call, wa in history if call or wa]
+    if not chased:
+        return f"Not chased in the last {months} months"
+    last = max(max(call, wa) for _, call, wa in chased)
+    return f"Chased {len(chased)} of last {months} months · last {last}"
 
 def get_status_map(tip_name, source, month_str=None):
     if month_str is None:
         month_str = CURRENT_MONTH
-
-    sheets = load_status_all()
-    tip_name = str(tip_name).upper().strip()
-    bbm_name = st.session_state.get("current_bbm", "").upper().strip()
-
-    if month_str not in sheets:
-        return {}
-
-    df = sheets[month_str]
-    if df.empty:
-        return {}
-
-    for c in STATUS_COLS:
-        if c not in df.columns:
-            df[c] = ""
-
-    sub = df[
-        (df["TIP_NAME_STD"] == tip_name) &
-        (df["BBM_STD"] == bbm_name) &
-        (df["SOURCE: OS/OG"] == source.upper())
-    ]
-
-    m = {}
-    for _, row in sub.iterrows():
-        acc = str(row["ACCOUNT_NO"])
-        m[acc] = (row.get("LAST_CALL_TIME", ""), row.get("LAST_WHATSAPP_TIME", ""))
-    return m
+    bbm_name = st.session_state.get("current_bbm", "")
+    with metrics.stage("status_map"):
+        return get_status_store().status_map(tip_name, bbm_name, source, month_str)
 
 # ----------------- BBM UPLOAD LOG (PERSISTENT) -----------------
-def load_upload_log():
-    if os.path.exists(UPLOAD_LOG_FILE):
-        return pd.read_excel(UPLOAD_LOG_FILE, dtype=str)
-    return pd.DataFrame(columns=["BBM_STD", "FILE_TYPE", "FILENAME", "UPLOADED_AT", "MONTH"])
-
-def log_upload(bbm_name, file_type, filename):
-    bbm_std = str(bbm_name).upper().strip()
-    month_str = CURRENT_MONTH
-    now = datetime.now().strftime("%Y-%m-%d %H:%M")
-
-    df = load_upload_log()
-    new_row = {
-        "BBM_STD": bbm_std,
+# Append-only JSON-lines log with fsync'd appends, rotation and in-memory
+# indexes by BBM / file type / month / content hash (see upload_log.py).
+@st.cache_resource(show_spinner=False)
+def get_upload_log():
+    log = UploadLog(UPLOAD_LOG_FILE)
+    if not log.segments() and os.path.exists(LEGACY_UPLOAD_LOG_FILE):
+        try:
+            import_xlsx_log(log, LEGACY_UPLOAD_LOG_FILE)
+        except Exception as e:
+            st.warning(f"Could not import {LEGACY_UPLOAD_LOG_FILE}: {e}")
+    return log
+
+def log_upload(bbm_name, file_type, filename, rows="", parse_seconds="", size="", sha256="", uploaded_by=""):
+    return get_upload_log().append({
+        "UPLOADED_AT": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "MONTH": CURRENT_MONTH,
+        "BBM_STD": str(bbm_name).upper().strip(),
         "FILE_TYPE": file_type,
         "FILENAME": filename,
-        "UPLOADED_AT": now,
-        "MONTH": month_str,
-    }
-    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-    df.to_excel(UPLOAD_LOG_FILE, index=False)
+        "ROWS": rows,
+        "PARSE_SECONDS": parse_seconds,
+        "BYTES": size,
+        "SHA256": sha256,
+        "UPLOADED_BY": uploaded_by or bbm_name,
+    })
 
 # ----------------- LOGIN -----------------
 def login_form():
@@ -444,106 +490,419 @@ with col_user:
         f"(BBM filter: `{st.session_state.current_bbm or 'ALL'}`)"
     )
 
-# ----------------- DATA LOAD (PERSIST AFTER RESTART) -----------------
-def load_data():
-    role = st.session_state.role
+# ----------------- STREAMING INGEST (UPLOADED WORKBOOKS) -----------------
+# Billing exports carry dozens of columns the dashboard never uses. Uploads are
+# read row by row with openpyxl's read-only mode, keeping only the columns below
+# (+ the first FTTH_CANDIDATES match), and assembled in INGEST_CHUNK_ROWS
+# blocks, so peak memory tracks the projected frame rather than the whole sheet.
+OS_INGEST_COLS = [COL_OS_TIP_NAME, COL_OS_BBM, COL_OS_BA, COL_OS_MOBILE,
+                  COL_OS_CUST_NAME, COL_OS_ADDR, COL_OS_AMOUNT]
+OG_INGEST_COLS = [COL_OG_TIP_NAME, COL_OG_BBM, COL_OG_BA, COL_OG_MOBILE,
+                  COL_OG_CUST_NAME, COL_OG_ADDR, COL_OG_AMOUNT]
+INGEST_CHUNK_ROWS = 20000
 
-    if st.session_state.os_df is not None or st.session_state.og_df is not None:
-        return st.session_state.os_df, st.session_state.og_df
 
-    os_df = None
-    og_df = None
+def _is_legacy_xls(src):
+    name = getattr(src, "name", src if isinstance(src, str) else "")
+    return str(name).lower().endswith(".xls")
 
-    if os.path.exists("Outstanding_latest.xlsx"):
+
+def workbook_sheet_names(src):
+    if _is_legacy_xls(src):
+        return pd.ExcelFile(src).sheet_names
+    from openpyxl import load_workbook
+    wb = load_workbook(src, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+        if hasattr(src, "seek"):
+            src.seek(0)
+
+
+def _projected_header(header, columns):
+    """Return [(position, column name)] for the wanted columns in header."""
+    by_name = {}
+    by_upper = {}
+    for pos, h in enumerate(header):
+        if h is None:
+            continue
+        by_name.setdefault(str(h).strip(), pos)
+        by_upper.setdefault(str(h).strip().upper(), pos)
+
+    keep = [(by_name[c], c) for c in columns if c in by_name]
+    for cand in FTTH_CANDIDATES:
+        pos = by_upper.get(str(cand).strip().upper())
+        if pos is not None:
+            keep.append((pos, str(header[pos]).strip()))
+            break
+    return keep
+
+
+def read_projected_sheet(src, sheet_name, columns, chunk_rows=INGEST_CHUNK_ROWS):
+    """Read only `columns` (+ FTTH column) of one sheet.
+
+    Returns (df, missing_columns). Legacy .xls files, which openpyxl cannot
+    stream, go through pandas with the same projection.
+    """
+    if _is_legacy_xls(src):
+        df = pd.read_excel(src, sheet_name=sheet_name)
+        keep = _projected_header(list(df.columns), columns)
+        df = df.iloc[:, [pos for pos, _ in keep]]
+        df.columns = [name for _, name in keep]
+    else:
+        from openpyxl import load_workbook
+        wb = load_workbook(src, read_only=True, data_only=True)
         try:
-            os_df = pd.read_excel("Outstanding_latest.xlsx")
-            st.session_state.os_df = os_df
-            st.session_state.os_filename = "Outstanding_latest.xlsx"
-            if not st.session_state.os_uploaded_at:
-                st.session_state.os_uploaded_at = "Loaded from last saved file"
-        except Exception as e:
-            st.warning(f"Could not read Outstanding_latest.xlsx: {e}")
+            rows = wb[sheet_name].iter_rows(values_only=True)
+            header = next(rows, None) or ()
+            keep = _projected_header(list(header), columns)
+            names = [name for _, name in keep]
+            positions = [pos for pos, _ in keep]
+
+            chunks, buf = [], []
+            for row in rows:
+                if row is None or all(v is None for v in row):
+                    continue
+                buf.append(tuple(row[p] if p < len(row) else None for p in positions))
+                if len(buf) >= chunk_rows:
+                    chunks.append(pd.DataFrame(buf, columns=names))
+                    buf = []
+            if buf or not chunks:
+                chunks.append(pd.DataFrame(buf, columns=names))
+            df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+        finally:
+            wb.close()
+            if hasattr(src, "seek"):
+                src.seek(0)
+
+    missing = [c for c in columns if c not in df.columns]
+    for c in missing:
+        df[c] = None
+    return df, missing
+
+
+# ----------------- SHARED DATASET CACHE (ALL SESSIONS) -----------------
+# Uploads live in DATA_ROOT as one Parquet partition per (month, BBM, source)
+# (see dataset_store.py). A TIP / BBM login only ever reads its own BBM's
+# newest partition; MGMT (bbm "") concatenates every BBM's partition, each one
+# loaded on first use. Frames are cached once per server process, keyed by the
+# partition fingerprint from manifest.json and read by that fingerprint, so a
+# new upload naturally misses and an old key never holds new data;
+# evict_shared_datasets() drops the old entries. Callers must treat returned
+# frames as read-only (slice / .copy() first).
+@st.cache_resource(show_spinner=False)
+def get_dataset_store():
+    return PartitionStore(DATA_ROOT)
+
+def dataset_version(source, bbm=""):
+    """Version token of the data a login with this BBM filter sees ("" = none)."""
+    return get_dataset_store().version(source, bbm)
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def shared_raw_frame(source, bbm, version):
+    store = get_dataset_store()
+    if bbm:
+        with metrics.stage("load"):
+            return store.read(source, bbm, version)
+    frames = [
+        shared_raw_frame(source, b, store.version(source, b))
+        for b in store.bbms(source)
+    ]
+    frames = [f for f in frames if f is not None]
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def shared_preprocessed(os_version, og_version, bbm_filter):
+    """preprocess() output for one (dataset version, BBM) pair, shared by every
+    session with the same BBM filter."""
+    os_raw = shared_raw_frame("OS", bbm_filter, os_version) if os_version else None
+    og_raw = shared_raw_frame("OG", bbm_filter, og_version) if og_version else None
+    with metrics.stage("preprocess"):
+        return preprocess(os_raw, og_raw, bbm_filter)
+
+def evict_shared_datasets():
+    shared_raw_frame.clear()
+    shared_preprocessed.clear()
+
+LEGACY_LATEST = (
+    ("OS", OS_LATEST_FILE, COL_OS_BBM, COL_OS_TIP_NAME, OS_INGEST_COLS),
+    ("OG", OG_LATEST_FILE, COL_OG_BBM, COL_OG_TIP_NAME, OG_INGEST_COLS),
+)
 
-    if os.path.exists("Barred_latest.xlsx"):
+def legacy_latest_signature():
+    """(path, mtime) of each legacy *_latest.xlsx (None if absent)."""
+    return tuple(
+        (path, os.path.getmtime(path) if os.path.exists(path) else None)
+        for _, path, _, _, _ in LEGACY_LATEST
+    )
+
+@st.cache_resource(show_spinner=False)
+def import_legacy_latest(signature):
+    """One-time move of a pre-partition Outstanding_latest.xlsx /
+    Barred_latest.xlsx into DATA_ROOT (month taken from the file's mtime).
+    Runs once per process and file state; returns {path: error} for files
+    that could not be read, so a broken workbook is not parsed again on
+    every rerun."""
+    store = get_dataset_store()
+    errors = {}
+    for (source, path, bbm_col, tip_col, columns), (_, mtime) in zip(LEGACY_LATEST, signature):
+        if store.has_source(source) or mtime is None:
+            continue
         try:
-            og_df = pd.read_excel("Barred_latest.xlsx")
-            st.session_state.og_df = og_df
-            st.session_state.og_filename = "Barred_latest.xlsx"
-            if not st.session_state.og_uploaded_at:
-                st.session_state.og_uploaded_at = "Loaded from last saved file"
+            df, _ = read_projected_sheet(path, workbook_sheet_names(path)[0], columns)
+            store.write_upload(source, df, bbm_col, datetime.fromtimestamp(mtime).strftime("%Y-%m"), {
+                "source_file": os.path.basename(path),
+                "uploaded_by": "",
+                "uploaded_at": "Loaded from last saved file",
+            }, amount_col=SOURCE_COLS[source][4], group_col=tip_col)
+            evict_shared_datasets()
         except Exception as e:
-            st.warning(f"Could not read Barred_latest.xlsx: {e}")
+            errors[path] = str(e)
+    return errors
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def shared_delta(source, bbm, version):
+    """ADDED / REMOVED (paid) / AMOUNT_CHANGED accounts of the BBM's newest
+    partition vs the one it replaced (None for a first upload)."""
+    return get_dataset_store().read_delta(source, bbm, version)
 
+# ----------------- DATA LOAD (PERSIST AFTER RESTART) -----------------
+def load_data():
+    role = st.session_state.role
+
+    for path, error in import_legacy_latest(legacy_latest_signature()).items():
+        warned = st.session_state.setdefault("legacy_import_warned", set())
+        if path not in warned:
+            warned.add(path)
+            st.warning(f"Could not import {path}: {error}")
     if role == "BBM":
-        st.subheader("📥 Upload Monthly Files (BBM Only)")
+        upload_files()
+
+    # Frames themselves live in the process-wide cache (see shared_raw_frame);
+    # the session only remembers which version it is looking at.
+    bbm_filter = _session_bbm_filter()
+    store = get_dataset_store()
+    versions = {}
+    for source in ("OS", "OG"):
+        version = dataset_version(source, bbm_filter)
+        if version and bbm_filter:
+            entry = store.latest_entry(source, bbm_filter) or {}
+            st.session_state[f"{source.lower()}_filename"] = entry.get("source_file", "")
+            st.session_state[f"{source.lower()}_uploaded_at"] = entry.get("uploaded_at", "")
+            st.session_state[f"{source.lower()}_uploaded_by"] = entry.get("uploaded_by", "")
+        versions[source] = version
+
+    st.session_state.os_version = versions["OS"]
+    st.session_state.og_version = versions["OG"]
+
+    if role != "BBM":
+        st.subheader("📁 Data Source")
+        if not versions["OS"]:
+            st.warning("Outstanding List not loaded yet. BBM must upload once.")
+        if not versions["OG"]:
+            st.warning("Barred Customer List not loaded yet. BBM must upload once.")
 
-        os_file = st.file_uploader(
-            "Upload **Outstanding List** (with 'Total OS' & 'PRIVATE OS' sheets)",
-            type=["xls", "xlsx"],
-            key="os_file",
-        )
-        og_file = st.file_uploader(
-            "Upload **Barred Customer List** (2nd sheet = OG/IC Barred List)",
-            type=["xls", "xlsx"],
-            key="og_file",
+    return versions["OS"], versions["OG"]
+
+
+def _session_bbm_filter():
+    if st.session_state.role not in ("TIP", "BBM"):
+        return ""
+    return str(st.session_state.get("current_bbm", "")).upper().strip()
+
+
+def store_upload(store, source, df, uploader, filename, file_bytes, uploaded_at, parse_seconds="", sha256=""):
+    """Log the upload, partition the list by BBM and keep the original
+    workbook as monthly_data/<month>/<Outstanding|Barred>_<BBM>.xlsx.
+
+    Runs on the persistence pool, so it must not touch st.session_state.
+    Partitions go to new fingerprint-named files and the manifest swap is the
+    commit point, so readers only ever see complete versions.
+    """
+    started = time.perf_counter()
+    log_upload(
+        uploader, source, filename, rows=int(len(df)), parse_seconds=parse_seconds,
+        size=len(file_bytes), sha256=sha256 or hashlib.sha256(file_bytes).hexdigest(),
+    )
+
+    bbm_col, tip_col = (COL_OS_BBM, COL_OS_TIP_NAME) if source == "OS" else (COL_OG_BBM, COL_OG_TIP_NAME)
+    col_ba, _, _, _, col_amount = SOURCE_COLS[source]
+    written = store.write_upload(source, df, bbm_col, CURRENT_MONTH, {
+        "source_file": filename,
+        "uploaded_by": uploader,
+        "uploaded_at": uploaded_at,
+    }, key_col=col_ba, amount_col=col_amount, group_col=tip_col)
+
+    prefix = "Outstanding" if source == "OS" else "Barred"
+    archive = os.path.join(DATA_ROOT, CURRENT_MONTH, f"{prefix}_{_safe_sheet_name(uploader, 'BBM')}.xlsx")
+    os.makedirs(os.path.dirname(archive), exist_ok=True)
+    with open(archive + ".tmp", "wb") as f:
+        f.write(file_bytes)
+    os.replace(archive + ".tmp", archive)
+
+    evict_shared_datasets()
+    metrics.observe("persist", time.perf_counter() - started)
+    return written
+
+
+# ----------------- BACKGROUND PERSISTENCE -----------------
+# Uploads are accepted as soon as they are parsed; writing partitions, the
+# archive copy and the upload log happens on a single shared worker thread
+# (one at a time, so concurrent BBM uploads cannot interleave their writes).
+# The BBM sees a "saving…" panel that polls until the job is done.
+@st.cache_resource(show_spinner=False)
+def get_persist_pool():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="tipos-persist")
+
+
+def submit_persist(label, fn, *args):
+    future = get_persist_pool().submit(fn, *args)
+    st.session_state.pending_saves = st.session_state.pending_saves + [(label, future)]
+
+
+def _collect_finished_saves():
+    """Move finished jobs from pending_saves into save_results; returns True
+    if anything finished."""
+    pending, finished = [], []
+    for label, future in st.session_state.pending_saves:
+        (finished if future.done() else pending).append((label, future))
+    for label, future in finished:
+        err = future.exception()
+        if err is None:
+            written = future.result()
+            st.session_state.save_results.append(
+                ("success", f"💾 {label} saved ({len(written)} BBM partition(s) for {CURRENT_MONTH}).")
+            )
+        else:
+            st.session_state.save_results.append(("error", f"Could not save {label}: {err}"))
+    st.session_state.pending_saves = pending
+    return bool(finished)
+
+
+@st.fragment(run_every=1.0)
+def render_pending_saves():
+    if _collect_finished_saves() and not st.session_state.pending_saves:
+        st.rerun()  # full rerun so the new partitions are loaded
+    for label, _ in st.session_state.pending_saves:
+        st.info(f"⏳ Saving {label}… you can keep working; the list refreshes when it is done.")
+
+
+def render_save_status():
+    _collect_finished_saves()
+    for kind, msg in st.session_state.save_results:
+        (st.success if kind == "success" else st.error)(msg)
+    st.session_state.save_results = []
+    if st.session_state.pending_saves:
+        render_pending_saves()
+
+
+def _upload_id(uploaded_file):
+    return getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+
+
+def _content_hash(uploaded_file, label):
+    """sha256 of the upload; warns if the same file was uploaded before."""
+    sha256 = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    earlier = get_upload_log().duplicates(sha256)
+    if earlier:
+        last = earlier[-1]
+        st.warning(
+            f"This {label} is identical to '{last['FILENAME']}' uploaded by "
+            f"{last['UPLOADED_BY'] or last['BBM_STD']} on {last['UPLOADED_AT']}."
         )
+    return sha256
+
+
+def upload_files():
+    """BBM upload widgets. Each uploaded file is ingested once (the uploader
+    keeps returning it on every rerun), then the shared cache is evicted so
+    every session picks up the new version."""
 
-        if os_file is not None:
-            try:
-                xls_os = pd.ExcelFile(os_file)
-                sheet_names = xls_os.sheet_names
-                sheet_total = "Total OS" if "Total OS" in sheet_names else sheet_names[-2]
-                sheet_private = "PRIVATE OS" if "PRIVATE OS" in sheet_names else sheet_names[-1]
+    st.subheader("📥 Upload Monthly Files (BBM Only)")
 
-                df_total = pd.read_excel(xls_os, sheet_name=sheet_total)
-                df_private = pd.read_excel(xls_os, sheet_name=sheet_private)
+    os_file = st.file_uploader(
+        "Upload **Outstanding List** (with 'Total OS' & 'PRIVATE OS' sheets)",
+        type=["xls", "xlsx"],
+        key="os_file",
+    )
+    og_file = st.file_uploader(
+        "Upload **Barred Customer List** (2nd sheet = OG/IC Barred List)",
+        type=["xls", "xlsx"],
+        key="og_file",
+    )
+
+    if os_file is not None and st.session_state.os_upload_id != _upload_id(os_file):
+        try:
+            sheet_names = workbook_sheet_names(os_file)
+            sheet_total = "Total OS" if "Total OS" in sheet_names else sheet_names[-2]
+            sheet_private = "PRIVATE OS" if "PRIVATE OS" in sheet_names else sheet_names[-1]
+
+            sha256 = _content_hash(os_file, "Outstanding List")
+            parse_started = time.perf_counter()
+            with metrics.stage("ingest"):
+                df_total, missing_total = read_projected_sheet(os_file, sheet_total, OS_INGEST_COLS)
+                df_private, missing_private = read_projected_sheet(os_file, sheet_private, OS_INGEST_COLS)
                 os_df = pd.concat([df_total, df_private], ignore_index=True)
+            parse_seconds = round(time.perf_counter() - parse_started, 3)
+            missing = sorted(set(missing_total) | set(missing_private))
+            if missing:
+                st.warning(f"Outstanding List is missing columns: {', '.join(missing)}")
+
+            st.session_state.os_upload_id = _upload_id(os_file)
+            st.session_state.os_filename = os_file.name
+            st.session_state.os_uploaded_at = datetime.now().strftime("%Y-%m-%d %H:%M")
+            st.session_state.os_uploaded_by = st.session_state.username
+            st.session_state.current_bbm = st.session_state.username
 
-                st.session_state.os_df = os_df
-                st.session_state.os_filename = os_file.name
-                st.session_state.os_uploaded_at = datetime.now().strftime("%Y-%m-%d %H:%M")
-                st.session_state.os_uploaded_by = st.session_state.username
+            submit_persist(
+                f"Outstanding List '{os_file.name}'", store_upload,
+                get_dataset_store(), "OS", os_df, st.session_state.username,
+                os_file.name, os_file.getvalue(), st.session_state.os_uploaded_at,
+                parse_seconds, sha256,
+            )
+            st.success(
+                f"✅ Outstanding List accepted: {len(os_df):,} rows "
+                f"(sheets used: '{sheet_total}', '{sheet_private}')"
+            )
+        except Exception as e:
+            st.error(f"Error reading Outstanding List file: {e}")
+
+    if og_file is not None and st.session_state.og_upload_id != _upload_id(og_file):
+        try:
+            og_sheet_names = workbook_sheet_names(og_file)
+            if len(og_sheet_names) < 2:
+                st.error("Barred file must have at least 2 sheets.")
+            else:
+                sheet_og = og_sheet_names[1]
+                sha256 = _content_hash(og_file, "Barred Customer List")
+                parse_started = time.perf_counter()
+                with metrics.stage("ingest"):
+                    og_df, missing = read_projected_sheet(og_file, sheet_og, OG_INGEST_COLS)
+                parse_seconds = round(time.perf_counter() - parse_started, 3)
+                if missing:
+                    st.warning(f"Barred Customer List is missing columns: {', '.join(missing)}")
+                st.session_state.og_upload_id = _upload_id(og_file)
+                st.session_state.og_filename = og_file.name
+                st.session_state.og_uploaded_at = datetime.now().strftime("%Y-%m-%d %H:%M")
+                st.session_state.og_uploaded_by = st.session_state.username
                 st.session_state.current_bbm = st.session_state.username
 
-                log_upload(st.session_state.username, "OS", os_file.name)
-
-                os_df.to_excel("Outstanding_latest.xlsx", index=False)
-                st.success(f"✅ Outstanding List loaded (sheets used: '{sheet_total}', '{sheet_private}')")
-            except Exception as e:
-                st.error(f"Error reading Outstanding List file: {e}")
-
-        if og_file is not None:
-            try:
-                xls_og = pd.ExcelFile(og_file)
-                if len(xls_og.sheet_names) < 2:
-                    st.error("Barred file must have at least 2 sheets.")
-                else:
-                    sheet_og = xls_og.sheet_names[1]
-                    og_df = pd.read_excel(xls_og, sheet_name=sheet_og)
-                    st.session_state.og_df = og_df
-                    st.session_state.og_filename = og_file.name
-                    st.session_state.og_uploaded_at = datetime.now().strftime("%Y-%m-%d %H:%M")
-                    st.session_state.og_uploaded_by = st.session_state.username
-                    st.session_state.current_bbm = st.session_state.username
-
-                    log_upload(st.session_state.username, "OG", og_file.name)
-
-                    og_df.to_excel("Barred_latest.xlsx", index=False)
-                    st.success(f"✅ Barred Customer List loaded (sheet used: '{sheet_og}')")
-            except Exception as e:
-                st.error(f"Error reading Barred List file: {e}")
-    else:
-        st.subheader("📁 Data Source")
-        if os_df is None:
-            st.warning("Outstanding List not loaded yet. BBM must upload once.")
-        if og_df is None:
-            st.warning("Barred Customer List not loaded yet. BBM must upload once.")
+                submit_persist(
+                    f"Barred Customer List '{og_file.name}'", store_upload,
+                    get_dataset_store(), "OG", og_df, st.session_state.username,
+                    og_file.name, og_file.getvalue(), st.session_state.og_uploaded_at,
+                    parse_seconds, sha256,
+                )
+                st.success(f"✅ Barred Customer List accepted: {len(og_df):,} rows (sheet used: '{sheet_og}')")
+        except Exception as e:
+            st.error(f"Error reading Barred List file: {e}")
 
-    return os_df, og_df
+    render_save_status()
 
-os_df_raw, og_df_raw = load_data()
+os_version, og_version = load_data()
 
-if os_df_raw is None and og_df_raw is None and st.session_state.role in ("TIP", "BBM"):
+if not os_version and not og_version and st.session_state.role in ("TIP", "BBM"):
     st.stop()
 
 # ----------------- PREPROCESS -----------------
@@ -557,7 +916,7 @@ def find_ftth_column(df):
     return None
 
 
-def preprocess(os_df, og_df):
+def preprocess(os_df, og_df, bbm_filter=""):
     if os_df is None:
         df_os = pd.DataFrame(columns=[
             COL_OS_TIP_NAME, COL_OS_BBM, COL_OS_BA,
@@ -615,76 +974,879 @@ def preprocess(os_df, og_df):
         df_og["TIP_NAME_STD"] = []
         df_og["BBM_STD"] = []
 
-    role = st.session_state.role
-    bbm_filter = st.session_state.get("current_bbm", "").upper().strip()
+    bbm_filter = str(bbm_filter or "").upper().strip()
 
-    if role in ("TIP", "BBM") and bbm_filter:
+    if bbm_filter:
         if not df_os.empty:
             df_os = df_os[df_os["BBM_STD"] == bbm_filter]
         if not df_og.empty:
             df_og = df_og[df_og["BBM_STD"] == bbm_filter]
 
+    # After the BBM filter, so each cache entry only carries its own rows.
+    df_os = compact_frame(build_contact_columns(df_os.copy(), "OS"), "OS")
+    df_og = compact_frame(build_contact_columns(df_og.copy(), "OG"), "OG")
+
     return df_os, df_og
 
 
-os_df, og_df = preprocess(os_df_raw, og_df_raw)
+# ----------------- COMPACT DTYPES -----------------
+# Shared frames are held for the life of the server process, so they are
+# stored compactly: TIP / BBM names as categoricals, ids and free text as
+# Arrow-backed strings, amounts as float64 rounded to paise. Columns the
+# dashboard never reads are dropped.
+try:
+    import pyarrow  # noqa: F401
+    TEXT_DTYPE = "string[pyarrow]"
+except ImportError:
+    TEXT_DTYPE = "string"
+
+CONTACT_COLS = ["WA_MESSAGE"]
+
+
+def _id_text(series):
+    """Account / mobile / service numbers as text without a trailing '.0'."""
+    return account_key(series).astype(TEXT_DTYPE)
+
+
+def compact_frame(df, source):
+    col_ba, col_name, col_addr, col_mobile, col_amount = SOURCE_COLS[source]
+    col_tip, col_bbm = (COL_OS_TIP_NAME, COL_OS_BBM) if source == "OS" else (COL_OG_TIP_NAME, COL_OG_BBM)
+
+    keep = [col_tip, col_bbm, col_ba, col_mobile, col_name, col_addr, col_amount,
+            "FTTH_NO", "TIP_NAME_STD", "BBM_STD"] + CONTACT_COLS
+    df = df[[c for c in keep if c in df.columns]].copy()
+
+    for c in (col_tip, col_bbm, "TIP_NAME_STD", "BBM_STD"):
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    for c in (col_ba, col_mobile, "FTTH_NO"):
+        if c in df.columns:
+            df[c] = _id_text(df[c])
+    for c in [col_name, col_addr] + CONTACT_COLS:
+        if c in df.columns:
+            df[c] = df[c].astype(object).where(df[c].notna(), "").map(str).astype(TEXT_DTYPE)
+    if col_amount in df.columns:
+        df[col_amount] = pd.to_numeric(df[col_amount], errors="coerce").fillna(0).round(2)
+    return df
+
+
+def frame_memory_mb(df):
+    if df is None:
+        return 0.0
+    return float(df.memory_usage(deep=True).sum()) / (1024 * 1024)
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def dataset_memory_report(os_version, og_version, bbm_filter):
+    """Per source: (rows, MB of the customer columns as compact_frame stores
+    them, MB of the same columns as plain object columns - how preprocess()
+    held them before - and MB of the contact columns)."""
+    report = {}
+    frames = shared_preprocessed(os_version, og_version, bbm_filter)
+    for source, df in zip(("OS", "OG"), frames):
+        data = df.drop(columns=[c for c in CONTACT_COLS if c in df.columns])
+        plain = data.astype({c: object for c in data.columns if not pd.api.types.is_float_dtype(data[c])})
+        contact = df[[c for c in CONTACT_COLS if c in df.columns]]
+        report[source] = (len(df), frame_memory_mb(data), frame_memory_mb(plain), frame_memory_mb(contact))
+    return report
+
+
+# MGMT works from the upload-time aggregates (see MGMT VIEW) and never loads
+# the circle's customer rows.
+_bbm_filter = _session_bbm_filter()
+_needs_rows = st.session_state.role in ("TIP", "BBM")
+if _needs_rows:
+    os_df, og_df = shared_preprocessed(os_version, og_version, _bbm_filter)
+
+if st.session_state.role == "BBM":
+    _mem = dataset_memory_report(os_version, og_version, _bbm_filter)
+    st.caption(
+        " · ".join(
+            f"{src}: {rows:,} rows, customer columns {mb:.2f} MB compact "
+            f"({plain_mb:.2f} MB as plain columns) + WhatsApp messages {contact_mb:.2f} MB"
+            for src, (rows, mb, plain_mb, contact_mb) in _mem.items()
+        )
+    )
+
+# ----------------- (BBM, TIP) ROW INDEX -----------------
+# Built once per dataset version: BBM -> TIP -> row positions for each source,
+# plus the sorted TIP list per BBM. Picking a TIP is then an O(k) iloc slice
+# instead of a boolean scan over the BBM's (or MGMT's whole circle's) rows.
+def build_group_index(df):
+    index = {}
+    if df.empty:
+        return index
+    for (bbm, tip), positions in df.groupby(["BBM_STD", "TIP_NAME_STD"], observed=True, sort=False).indices.items():
+        index.setdefault(bbm, {})[tip] = positions
+    return index
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def shared_group_index(os_version, og_version, bbm_filter):
+    os_df, og_df = shared_preprocessed(os_version, og_version, bbm_filter)
+    with metrics.stage("group_index"):
+        groups = {"OS": build_group_index(os_df), "OG": build_group_index(og_df)}
+    tips = {}
+    for by_bbm in groups.values():
+        for bbm, by_tip in by_bbm.items():
+            tips.setdefault(bbm, set()).update(by_tip)
+    groups["TIPS"] = {bbm: sorted(names) for bbm, names in tips.items()}
+    return groups
+
+
+def tip_rows(df, source, bbm, tip):
+    """The rows of df (a shared preprocessed frame) for one (BBM, TIP)."""
+    positions = group_index[source].get(bbm, {}).get(tip)
+    if positions is None:
+        return df.iloc[0:0]
+    return df.iloc[positions]
+
+
+def tips_for_bbm(bbm):
+    return group_index["TIPS"].get(bbm, [])
+
+
+if _needs_rows:
+    group_index = shared_group_index(os_version, og_version, _bbm_filter)
+
+# ----------------- OS / OG ACCOUNT LINKS -----------------
+# Customers who are both outstanding (OS) and OG/IC barred are contacted once:
+# a hash join on the account number, built once per dataset version, maps each
+# such account to its TIP on the other list so update_status() can mark both.
+@st.cache_resource(show_spinner=False, max_entries=64)
+def shared_account_links(os_version, og_version, bbm_filter):
+    """{"OS": {account: TIP on the OG list}, "OG": {account: TIP on the OS list}}."""
+    os_df, og_df = shared_preprocessed(os_version, og_version, bbm_filter)
+    os_tips = dict(zip(os_df[COL_OS_BA].astype(str), os_df["TIP_NAME_STD"].astype(str)))
+    og_tips = dict(zip(og_df[COL_OG_BA].astype(str), og_df["TIP_NAME_STD"].astype(str)))
+    both = (os_tips.keys() & og_tips.keys()) - {""}
+    return {"OS": {a: og_tips[a] for a in both}, "OG": {a: os_tips[a] for a in both}}
+
+
+def session_account_links():
+    return shared_account_links(
+        st.session_state.os_version, st.session_state.og_version, _session_bbm_filter()
+    )
+
+# ----------------- PRIORITY WORKLIST -----------------
+# "Who to chase first": every customer gets a 0-100 score in one vectorized
+# pass over the BBM's frame -
+#   PRIORITY_WEIGHTS["amount"]        x outstanding percentile within the BBM
+#   PRIORITY_WEIGHTS["not_contacted"] if not called / WhatsApped this month
+#   PRIORITY_WEIGHTS["neglected"]     x share of the previous HISTORY_MONTHS - 1
+#                                       months the customer was not chased
+#   PRIORITY_WEIGHTS["linked"]        if also on the other list (OS <-> OG/IC)
+# Everything except "contacted this month" is fixed for a dataset version and
+# month, so it is computed once per BBM (PriorityRanker). A page only needs
+# the first `k` customers, which np.argpartition picks without sorting the
+# whole list; the order is memoised until the status log's version moves.
+PRIORITY_SORT = "Priority: chase first"
+PRIORITY_WEIGHTS = {"amount": 40, "not_contacted": 30, "neglected": 20, "linked": 10}
+
+
+class PriorityRanker:
+    def __init__(self, frames, links, histories, month, months=None):
+        """frames: {source: preprocessed frame}; links: shared_account_links();
+        histories: {source: contact_history over the window}."""
+        months = HISTORY_MONTHS if months is None else months
+        w = PRIORITY_WEIGHTS
+        self.accounts, self.labels, self.base = {}, {}, {}
+        for source, df in frames.items():
+            col_ba, col_amount = SOURCE_COLS[source][0], SOURCE_COLS[source][4]
+            accounts = df[col_ba].astype(str).to_numpy()
+            history = histories.get(source, {})
+            chased = np.fromiter(
+                (sum(1 for m, call, wa in history.get(a, ()) if m < month and (call or wa)) for a in accounts),
+                dtype=float, count=len(accounts),
+            )
+            neglected = 1 - np.minimum(chased / max(months - 1, 1), 1)
+            linked = pd.Index(accounts).isin(list(links.get(source, {}))).astype(float)
+            amount = df[col_amount].rank(pct=True).fillna(0).to_numpy(dtype=float)
+            # A vanishing tie-break on file order keeps pages stable for any k.
+            self.base[source] = (
+                w["amount"] * amount + w["neglected"] * neglected + w["linked"] * linked
+                - np.arange(len(accounts)) * 1e-9
+            )
+            self.accounts[source] = accounts
+            self.labels[source] = df.index
+        self.status_version = None
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def top(self, source, rows, status_map, k, status_version, memo_key=None):
+        """(positions into rows, scores) of its k highest-priority customers,
+        best first."""
+        with self._lock:
+            if self.status_version != status_version:
+                self._memo.clear()
+                self.status_version = status_version
+            hit = self._memo.get((memo_key, k)) if memo_key is not None else None
+        if hit is not None:
+            return hit
+        pos = self.labels[source].get_indexer(rows.index)
+        accounts = self.accounts[source][pos]
+        contacted = pd.Index(accounts).isin([a for a, (call, wa) in status_map.items() if call or wa])
+        score = self.base[source][pos] + PRIORITY_WEIGHTS["not_contacted"] * ~contacted
+        k = min(k, len(score))
+        top = np.argpartition(-score, k - 1)[:k] if 0 < k < len(score) else np.arange(len(score))
+        top = top[np.argsort(-score[top], kind="stable")][:k]
+        result = (top, score[top])
+        if memo_key is not None:
+            with self._lock:
+                if self.status_version == status_version:
+                    self._memo[(memo_key, k)] = result
+        return result
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def priority_ranker(os_version, og_version, bbm_filter, month):
+    os_df, og_df = shared_preprocessed(os_version, og_version, bbm_filter)
+    frames = {"OS": os_df, "OG": og_df}
+    store = get_status_store()
+    with metrics.stage("priority_base"):
+        histories = {
+            src: store.contact_history(src, df[SOURCE_COLS[src][0]].astype(str).tolist(), history_start_month())
+            for src, df in frames.items() if not df.empty
+        }
+        return PriorityRanker(
+            frames, shared_account_links(os_version, og_version, bbm_filter), histories, month,
+        )
+
+
+def priority_page(rows, source, tip_name, show, status_map, start, page_size):
+    """rows[start:start + page_size] in priority order (top-k, not a full sort)."""
+    ranker = priority_ranker(
+        st.session_state.os_version, st.session_state.og_version, _session_bbm_filter(), CURRENT_MONTH,
+    )
+    with metrics.stage("priority_topk"):
+        top, _ = ranker.top(
+            source, rows, status_map, start + page_size, get_status_store().version,
+            memo_key=(source, str(tip_name).upper().strip(), show),
+        )
+    return rows.iloc[top[start:start + page_size]]
+
+# ----------------- PAGED CUSTOMER LIST -----------------
+# Only one page of cards is rendered per rerun (3 widgets per customer), so
+# render time depends on the page size, not on how many customers a TIP has.
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
+DEFAULT_PAGE_SIZE = int(os.environ.get("TIPOS_PAGE_SIZE", "25"))
+
+SORT_OPTIONS = [
+    PRIORITY_SORT,
+    "Outstanding: high → low",
+    "Outstanding: low → high",
+    "Customer name",
+    "File order",
+]
+FILTER_OPTIONS = ["All", "Not contacted", "Contacted"]
+
+
+def select_rows(df, source, status_map, sort_by, show):
+    """Filter + sort a TIP's customers on the server before paging."""
+    col_ba, col_name, _, _, col_amount = SOURCE_COLS[source]
+
+    if show != "All" and not df.empty:
+        contacted = df[col_ba].astype(str).isin(status_map.keys())
+        df = df[contacted] if show == "Contacted" else df[~contacted]
+
+    if sort_by == "Outstanding: high → low":
+        df = df.sort_values(col_amount, ascending=False, kind="stable")
+    elif sort_by == "Outstanding: low → high":
+        df = df.sort_values(col_amount, ascending=True, kind="stable")
+    elif sort_by == "Customer name":
+        df = df.sort_values(col_name, key=lambda s: s.astype(str).str.upper(), kind="stable")
+    return df
+
+
+LINKED_BADGE = {
+    "OS": "<br><small>🔗 Also on the OG/IC barred list – one update marks both</small>",
+    "OG": "<br><small>🔗 Also on the Outstanding (OS) list – one update marks both</small>",
+}
+
+
+def customer_card_html(card_body, last_call, last_wa, linked_source=None, cadence=""):
+    """Wrap a card_bodies() entry with the status-dependent parts."""
+    bg = "#d4ffd4" if (last_call or last_wa) else "#fff7d4"
+    return (
+        f"<div style='background:{bg};padding:8px;border-radius:6px;'>"
+        f"{card_body}"
+        f"<br><small>Last Call: {last_call or '-'} | Last WA: {last_wa or '-'}</small>"
+        f"{f'<br><small>📅 {cadence}</small>' if cadence else ''}"
+        f"{LINKED_BADGE.get(linked_source, '')}"
+        "</div>"
+    )
+
+
+def campaign_frame(df, source):
+    """One row per customer with the wa.me / tel: links."""
+    col_ba, col_name, _, col_mobile, col_amount = SOURCE_COLS[source]
+    wa_url, tel_url = contact_links(df, source)
+    return pd.DataFrame({
+        "ACCOUNT_NO": df[col_ba].astype(str).to_numpy(),
+        "CUSTOMER_NAME": df[col_name].astype(str).to_numpy(),
+        "MOBILE": df[col_mobile].astype(str).to_numpy(),
+        "OUTSTANDING": df[col_amount].to_numpy(),
+        "WA_URL": wa_url.to_numpy(),
+        "TEL_URL": tel_url.to_numpy(),
+        "WA_MESSAGE": df["WA_MESSAGE"].astype(str).to_numpy(),
+    })
+
+
+def render_bulk_actions(rows, page_df, source, tip_name, key_prefix):
+    """Mark picked (or all filtered) customers in one status write and export
+    their WhatsApp links as a campaign file."""
+    col_ba, col_name = SOURCE_COLS[source][:2]
+    with st.expander("⚡ Bulk actions"):
+        scopes = ["Picked customers on this page", "All customers in this filter"]
+        scope = st.radio("Apply to", scopes, key=f"{key_prefix}_bulk_scope", horizontal=True)
+        pick_key = f"{key_prefix}_bulk_pick"
+        if scope == scopes[0]:
+            names = dict(zip(page_df[col_ba].map(str), page_df[col_name].astype(str)))
+            picked = st.multiselect(
+                "Customers", list(names), format_func=lambda acc: f"{names[acc]} ({acc})", key=pick_key,
+            )
+            target = page_df[page_df[col_ba].map(str).isin(picked)]
+        else:
+            target = rows
+        st.caption(f"{len(target):,} customers selected")
+
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            mark_call = st.button("📞 Mark called", key=f"{key_prefix}_bulk_call", disabled=target.empty)
+        with c2:
+            mark_wa = st.button("🟢 Mark WA sent", key=f"{key_prefix}_bulk_wa", disabled=target.empty)
+        with c3:
+            # The CSV is only built on request and kept for the same rows, so
+            # reruns (e.g. a card click) do not re-serialise the whole filter.
+            csv_key = f"{key_prefix}_bulk_csv_data"
+            signature = hash((source, tuple(target.index)))
+            prepared = st.session_state.get(csv_key)
+            if prepared is not None and prepared[0] == signature:
+                st.download_button(
+                    "⬇️ Campaign file (CSV)", prepared[1],
+                    file_name=f"campaign_{_safe_sheet_name(tip_name, 'TIP')}_{source}_{CURRENT_MONTH}.csv",
+                    mime="text/csv", key=f"{key_prefix}_bulk_csv",
+                )
+            elif st.button("📄 Prepare campaign file", key=f"{key_prefix}_bulk_prepare", disabled=target.empty):
+                st.session_state[csv_key] = (
+                    signature, campaign_frame(target, source).to_csv(index=False).encode("utf-8-sig"),
+                )
+                st.rerun()
+        if mark_call or mark_wa:
+            update_status_many(
+                tip_name, source, target[col_ba].map(str).tolist(),
+                update_call=mark_call, update_whatsapp=mark_wa,
+            )
+            what = "called" if mark_call else "WhatsApp sent"
+            st.session_state[f"{key_prefix}_bulk_done"] = f"Marked {len(target):,} customers as {what}."
+            st.session_state.pop(pick_key, None)
+            st.rerun()
+
+
+def render_customer_list(df, source, tip_name, key_prefix):
+    """Paged Call / WhatsApp worklist for one TIP's customers from one source."""
+    status_map = get_status_map(tip_name, source)
+    links = session_account_links()[source]
+
+    c_show, c_sort, c_size = st.columns([1, 1, 1])
+    with c_show:
+        show = st.selectbox("Show", FILTER_OPTIONS, key=f"{key_prefix}_show")
+    with c_sort:
+        sort_by = st.selectbox("Sort by", SORT_OPTIONS, key=f"{key_prefix}_sort")
+    with c_size:
+        default_size = DEFAULT_PAGE_SIZE if DEFAULT_PAGE_SIZE in PAGE_SIZE_OPTIONS else 25
+        page_size = st.selectbox(
+            "Per page", PAGE_SIZE_OPTIONS,
+            index=PAGE_SIZE_OPTIONS.index(default_size),
+            key=f"{key_prefix}_size",
+        )
+
+    done_key = f"{key_prefix}_bulk_done"
+    if done_key in st.session_state:
+        st.success(st.session_state.pop(done_key))
+
+    rows = select_rows(df, source, status_map, sort_by, show)
+    total = len(rows)
+    if total == 0:
+        st.info("No customers match this filter.")
+        return
+
+    page_key = f"{key_prefix}_page"
+    n_pages = -(-total // page_size)
+    page = 1
+    if n_pages > 1:
+        # Clamp before the widget exists (a filter change can shrink n_pages).
+        if st.session_state.get(page_key, 1) > n_pages:
+            st.session_state[page_key] = n_pages
+        page = int(st.number_input(
+            f"Page (of {n_pages})", min_value=1, max_value=n_pages, step=1, key=page_key,
+        ))
+    start = (page - 1) * page_size
+    if sort_by == PRIORITY_SORT:
+        page_df = priority_page(rows, source, tip_name, show, status_map, start, page_size)
+    else:
+        page_df = rows.iloc[start:start + page_size]
+    st.caption(f"Showing {start + 1}–{start + len(page_df)} of {total} customers")
+    render_bulk_actions(rows, page_df, source, tip_name, key_prefix)
+    render_cards(page_df, source, tip_name, key_prefix, status_map, links)
+
+
+def render_cards(page_df, source, tip_name, key_prefix, status_map, links):
+    """Customer cards with Call Done / WA Sent buttons for the given rows."""
+    col_ba = SOURCE_COLS[source][0]
+    metrics.inc("rows_rendered", len(page_df))
+
+    page_accounts = page_df[col_ba].map(str).tolist()
+    history = get_contact_history(source, page_accounts)
+
+    render_started = time.perf_counter()
+    for idx, acc_no, card_body in zip(page_df.index, page_accounts, card_bodies(page_df, source)):
+        last_call, last_wa = status_map.get(acc_no, ("", ""))
+        st.markdown(
+            customer_card_html(
+                card_body, last_call, last_wa, source if acc_no in links else None,
+                contact_cadence(history.get(acc_no, [])),
+            ),
+            unsafe_allow_html=True,
+        )
+
+        c1, c2 = st.columns(2)
+        with c1:
+            if st.button("📞 Call Done", key=f"{key_prefix}_call_{idx}"):
+                update_status(tip_name, source, acc_no, update_call=True)
+                st.rerun()
+        with c2:
+            if st.button("🟢 WA Sent", key=f"{key_prefix}_wa_{idx}"):
+                update_status(tip_name, source, acc_no, update_whatsapp=True)
+                st.rerun()
+        st.write("")
+    metrics.observe("render", time.perf_counter() - render_started)
+
+# ----------------- CUSTOMER SEARCH -----------------
+# One CustomerIndex (search_index) per dataset version and BBM filter, shared
+# by every session: prefix search on account / mobile / FTTH numbers and word
+# search on names and addresses, without scanning the frames. MGMT's
+# circle-wide index is only built the first time someone searches.
+SEARCH_LIMIT = 50
+SEARCH_COLS = [
+    "SOURCE", "TIP_NAME_STD", "ACCOUNT_NO", "CUSTOMER_NAME", "MOBILE", "FTTH_NO",
+    "OUTSTANDING", "ADDRESS", "LAST_CALL", "LAST_WA",
+]
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def shared_search_index(os_version, og_version, bbm_filter):
+    os_df, og_df = shared_preprocessed(os_version, og_version, bbm_filter)
+    index = CustomerIndex()
+    with metrics.stage("search_index"):
+        for source, df in (("OS", os_df), ("OG", og_df)):
+            col_ba, col_name, col_addr, col_mobile, _ = SOURCE_COLS[source]
+            index.add(source, df, [col_ba, col_mobile, "FTTH_NO"], [col_name, col_addr], owner_col="TIP_NAME_STD")
+        return index.build()
+
+
+def search_customers(query, owner=None):
+    """{source: matching rows of the shared frame}, best SEARCH_LIMIT overall."""
+    frames = dict(zip(("OS", "OG"), shared_preprocessed(os_version, og_version, _bbm_filter)))
+    index = shared_search_index(os_version, og_version, _bbm_filter)
+    with metrics.stage("search"):
+        positions = {"OS": [], "OG": []}
+        for row in index.search(query, SEARCH_LIMIT, owner):
+            source, pos = index.ref(row)
+            positions[source].append(pos)
+        return {src: frames[src].iloc[pos] for src, pos in positions.items() if pos}
+
+
+def search_results_frame(hits):
+    """One table over both sources, with this month's call / WA times."""
+    store = get_status_store()
+    parts = []
+    for source, df in hits.items():
+        col_ba, col_name, col_addr, col_mobile, col_amount = SOURCE_COLS[source]
+        part = pd.DataFrame({
+            "SOURCE": source,
+            "TIP_NAME_STD": df["TIP_NAME_STD"].astype(str).to_numpy(),
+            "ACCOUNT_NO": df[col_ba].astype(str).to_numpy(),
+            "CUSTOMER_NAME": df[col_name].astype(str).to_numpy(),
+            "MOBILE": df[col_mobile].astype(str).to_numpy(),
+            "FTTH_NO": df["FTTH_NO"].astype(str).to_numpy(),
+            "OUTSTANDING": df[col_amount].to_numpy(),
+            "ADDRESS": df[col_addr].astype(str).to_numpy(),
+        })
+        status = [
+            store.get(tip, bbm, source, acc, CURRENT_MONTH) or ("", "")
+            for tip, bbm, acc in zip(part["TIP_NAME_STD"], df["BBM_STD"].astype(str), part["ACCOUNT_NO"])
+        ]
+        part["LAST_CALL"] = [call for call, _ in status]
+        part["LAST_WA"] = [wa for _, wa in status]
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)[SEARCH_COLS]
+
+
+def render_customer_search(key_prefix, tip_name=None):
+    """Search box; a TIP gets actionable cards for their own customers,
+    BBM / MGMT a table across their TIPs."""
+    query = st.text_input(
+        "🔎 Find a customer", key=f"{key_prefix}_search",
+        placeholder="Mobile, account or FTTH number – or name / address words",
+    )
+    if not query.strip():
+        return
+    owner = str(tip_name).upper().strip() if tip_name else None
+    try:
+        hits = search_customers(query, owner)
+    except Exception as e:
+        st.warning(f"Search failed: {e}")
+        return
+    if not hits:
+        st.info("No customers match this search.")
+        return
+    found = sum(len(df) for df in hits.values())
+    st.caption(f"{found} match{'es' if found != 1 else ''}" + (f" (first {SEARCH_LIMIT})" if found >= SEARCH_LIMIT else ""))
+    if tip_name:
+        for source, df in hits.items():
+            render_cards(
+                df, source, tip_name, f"{key_prefix}_{source.lower()}",
+                get_status_map(tip_name, source), session_account_links()[source],
+            )
+    else:
+        st.dataframe(search_results_frame(hits), use_container_width=True, hide_index=True)
+
+# ----------------- REPORT EXPORTS -----------------
+# Customer lists with this month's call / WhatsApp times as xlsx or CSV,
+# streamed to disk in EXPORT_CHUNK_ROWS chunks (report_export) instead of
+# being built in memory. A report is only written when the user clicks
+# "Prepare". Files in EXPORT_DIR are keyed on the dataset versions and a
+# digest of the scope's own status rows, so a call logged for another TIP
+# does not make the file stale and a repeat download is just a file read.
+EXPORT_DIR = os.environ.get("TIPOS_EXPORT_DIR", "exports")
+EXPORT_CHUNK_ROWS = 20_000
+REPORT_COLS = [
+    "BBM_STD", "TIP_NAME_STD", "ACCOUNT_NO", "CUSTOMER_NAME", "MOBILE", "FTTH_NO",
+    "ADDRESS", "OUTSTANDING", "LAST_CALL_TIME", "LAST_WHATSAPP_TIME",
+]
+REPORT_SHEETS = {"OS": "Outstanding (OS)", "OG": "OG-IC Barred"}
+REPORT_MIME = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+}
+
+
+def report_chunks(df, source, month=None):
+    """REPORT_COLS frames of up to EXPORT_CHUNK_ROWS rows of df."""
+    month = CURRENT_MONTH if month is None else month
+    col_ba, col_name, col_addr, col_mobile, col_amount = SOURCE_COLS[source]
+    store = get_status_store()
+    maps = {}
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        part = df.iloc[start:start + EXPORT_CHUNK_ROWS]
+        out = pd.DataFrame({
+            "BBM_STD": part["BBM_STD"].astype(str).to_numpy(),
+            "TIP_NAME_STD": part["TIP_NAME_STD"].astype(str).to_numpy(),
+            "ACCOUNT_NO": part[col_ba].astype(str).to_numpy(),
+            "CUSTOMER_NAME": part[col_name].astype(str).to_numpy(),
+            "MOBILE": part[col_mobile].astype(str).to_numpy(),
+            "FTTH_NO": part["FTTH_NO"].astype(str).to_numpy(),
+            "ADDRESS": part[col_addr].astype(str).to_numpy(),
+            "OUTSTANDING": part[col_amount].to_numpy(),
+        })
+        status = []
+        for bbm, tip, acc in zip(out["BBM_STD"], out["TIP_NAME_STD"], out["ACCOUNT_NO"]):
+            status_map = maps.get((bbm, tip))
+            if status_map is None:
+                status_map = maps[(bbm, tip)] = store.status_map(tip, bbm, source, month)
+            status.append(status_map.get(acc, ("", "")))
+        out["LAST_CALL_TIME"] = [call for call, _ in status]
+        out["LAST_WHATSAPP_TIME"] = [wa for _, wa in status]
+        yield out
+
+
+def scope_status_digest(frames, month):
+    """Digest of the status rows of every (BBM, TIP) in frames for month."""
+    store = get_status_store()
+    h = hashlib.sha256()
+    for src, df in sorted(frames.items()):
+        groups = df[["BBM_STD", "TIP_NAME_STD"]].drop_duplicates().astype(object).fillna("")
+        for bbm, tip in sorted(zip(groups["BBM_STD"], groups["TIP_NAME_STD"])):
+            status = sorted(map(repr, store.status_map(tip, bbm, src, month).items()))
+            h.update(repr((src, bbm, tip, status)).encode("utf-8"))
+    return h.hexdigest()
+
+def scope_changed(scope, version):
+    """True if a status row of this month inside scope ("TIP", bbm, tip) /
+    ("BBM", bbm) / ("CIRCLE",) was written after version."""
+    bbm = str(scope[1]).upper().strip() if len(scope) > 1 else None
+    tip = str(scope[2]).upper().strip() if len(scope) > 2 else None
+    _, rows = get_status_store().changes_since(version, bbm)
+    if rows is None:
+        return True
+    return any(r[1] == CURRENT_MONTH and (tip is None or str(r[2]).upper().strip() == tip) for r in rows)
+
+def read_report(key, ext, get_frames):
+    """Bytes of the report for key, writing it first if it is missing. A file
+    another session prunes between the check and the read is written again."""
+    path = export_path(EXPORT_DIR, key, ext)
+    for _ in range(2):
+        if not os.path.exists(path):
+            with st.spinner("Writing report..."), metrics.stage("export"):
+                sheets = [
+                    (REPORT_SHEETS[src], REPORT_COLS, report_chunks(df, src))
+                    for src, df in get_frames().items() if not df.empty
+                ]
+                path = build_report(EXPORT_DIR, key, ext, sheets)
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            continue
+    raise FileNotFoundError(path)
+
+def render_report_download(label, scope, get_frames, n_rows, key_prefix):
+    """"Prepare" button for one report, then its download button.
+    get_frames() -> {source: rows} is only called after the click."""
+    fmt = st.radio("Format", ["Excel (.xlsx)", "CSV"], horizontal=True, key=f"{key_prefix}_fmt")
+    ext = "xlsx" if fmt.startswith("Excel") else "csv"
+    base = (scope, os_version, og_version, CURRENT_MONTH, ext)
+    state_key = f"{key_prefix}_file"
+    store = get_status_store()
+    prepared = st.session_state.get(state_key)
+    try:
+        if prepared is not None and prepared["base"] == base and prepared["version"] != store.version:
+            if scope_changed(scope, prepared["version"]):
+                prepared = None
+            else:
+                prepared["version"] = store.version
+        if prepared is None or prepared["base"] != base:
+            if not st.button(f"Prepare {label} ({n_rows:,} rows)", key=f"{key_prefix}_prepare"):
+                return
+            version = store.version
+            key = base + (scope_status_digest(get_frames(), CURRENT_MONTH),)
+            prepared = st.session_state[state_key] = {"base": base, "key": key, "version": version}
+        data = read_report(prepared["key"], ext, get_frames)
+    except Exception as e:
+        st.error(f"Could not build the report: {e}")
+        return
+    st.download_button(
+        f"⬇️ Download {label}", data,
+        file_name=f"{_safe_sheet_name(label, 'report').replace(' ', '_')}_{CURRENT_MONTH}.{ext}",
+        mime=REPORT_MIME[ext], key=f"{key_prefix}_download",
+    )
+
+def render_status_log_download():
+    """MGMT: the whole contact status log as the month-per-sheet
+    STATUS_FILE workbook (export_xlsx), written only after a click."""
+    store = get_status_store()
+    prepared = st.session_state.get("mgmt_status_log")
+    if prepared is None or prepared[0] != store.version:
+        if not st.button(f"Prepare {os.path.basename(STATUS_FILE)}", key="mgmt_status_log_prepare"):
+            return
+        version = store.version
+        fd, tmp = tempfile.mkstemp(suffix=".xlsx")
+        os.close(fd)
+        try:
+            with st.spinner("Writing status log..."), metrics.stage("export"):
+                export_xlsx(store, tmp)
+                with open(tmp, "rb") as f:
+                    prepared = st.session_state["mgmt_status_log"] = (version, f.read())
+        except Exception as e:
+            st.error(f"Could not export the status log: {e}")
+            return
+        finally:
+            os.remove(tmp)
+    st.download_button(
+        f"⬇️ Download {os.path.basename(STATUS_FILE)}", prepared[1],
+        file_name=f"tip_contact_status_{CURRENT_MONTH}.xlsx",
+        mime=REPORT_MIME["xlsx"], key="mgmt_status_log_download",
+    )
 
 # ----------------- TIP VIEW -----------------
 def tip_view():
     tip_name = st.session_state.username
     bbm_name = st.session_state.current_bbm
 
-    tip_os = os_df[os_df["TIP_NAME_STD"] == tip_name].copy()
-    tip_og = og_df[og_df["TIP_NAME_STD"] == tip_name].copy()
+    tip_os = tip_rows(os_df, "OS", str(bbm_name).upper().strip(), tip_name)
+    tip_og = tip_rows(og_df, "OG", str(bbm_name).upper().strip(), tip_name)
 
     st.subheader(f"📌 TIP Dashboard – {tip_name} (BBM: {bbm_name})")
+    render_customer_search("tip_find", tip_name)
+    with st.expander("⬇️ Download my customer list"):
+        render_report_download(
+            f"{tip_name} customers", ("TIP", str(bbm_name).upper().strip(), tip_name),
+            lambda: {"OS": tip_os, "OG": tip_og}, len(tip_os) + len(tip_og), "tip_report",
+        )
 
     # OS
     st.markdown("---")
     st.subheader("📴 Disconnected Customers – OS")
-    status_map_os = get_status_map(tip_name, "OS")
 
     if tip_os.empty:
         st.info("No disconnected OS customers for this TIP.")
     else:
-        for idx, row in tip_os.iterrows():
-            cust_name = str(row[COL_OS_CUST_NAME])
-            addr = str(row[COL_OS_ADDR])
-            mobile = row[COL_OS_MOBILE]
-            amount = row[COL_OS_AMOUNT]
-            acc_no = str(row[COL_OS_BA])
-
-            ftth_no = str(row.get("FTTH_NO", "")).strip()
-            ftth_line = f"<br><b>FTTH No:</b> {ftth_no}" if ftth_no else ""
-
-            msg = build_wa_message(cust_name, amount, acc_no, ftth_no)
-            wa_link = make_whatsapp_link(mobile, msg)
-
-            last_call, last_wa = status_map_os.get(acc_no, ("", ""))
-            green = bool(last_call or last_wa)
-            bg = "#d4ffd4" if green else "#fff7d4"
-
-            st.markdown(
-                f"<div style='background:{bg};padding:8px;border-radius:6px;'>"
-                f"<b>{cust_name}</b> | Acc: {acc_no}{ftth_line}<br>"
-                f"{addr}<br>"
-                f"OS: ₹{amount:,.2f}<br>"
-                f"{make_tel_link(mobile)}&nbsp;&nbsp;{wa_link}"
-                f"<br><small>Last Call: {last_call or '-'} | Last WA: {last_wa or '-'}</small>"
-                "</div>",
-                unsafe_allow_html=True,
+        render_customer_list(tip_os, "OS", tip_name, key_prefix="os")
+
+    # OG
+    st.markdown("---")
+    st.subheader("🚫 OG/IC Barred Customers")
+
+    if tip_og.empty:
+        st.info("No OG/IC barred customers for this TIP.")
+    else:
+        render_customer_list(tip_og, "OG", tip_name, key_prefix="og")
+
+# ----------------- MONTH-OVER-MONTH CHANGES -----------------
+def render_upload_delta(bbm_name):
+    entry = get_dataset_store().latest_entry("OS", bbm_name) or {}
+    info = entry.get("delta")
+    if not info:
+        return
+    delta = shared_delta("OS", bbm_name, entry["fingerprint"])
+    if delta is None:
+        return
+
+    paid = delta[delta["CHANGE"] == "REMOVED"]
+    added = delta[delta["CHANGE"] == "ADDED"]
+    changed = delta[delta["CHANGE"] == "AMOUNT_CHANGED"]
+    st.markdown(f"#### 🔁 Changes since previous Outstanding List ({info['base_month']})")
+    c1, c2, c3 = st.columns(3)
+    c1.metric("✅ Paid / dropped", f"{len(paid):,}", f"₹{paid['OLD_AMOUNT'].sum():,.2f}", delta_color="off")
+    c2.metric("🆕 New customers", f"{len(added):,}", f"₹{added['NEW_AMOUNT'].sum():,.2f}", delta_color="off")
+    c3.metric("✏️ Amount changed", f"{len(changed):,}")
+    if not paid.empty:
+        with st.expander("Newly paid accounts"):
+            st.dataframe(
+                paid[["ACCOUNT_NO", "OLD_AMOUNT"]].rename(columns={"OLD_AMOUNT": "WAS_OUTSTANDING"}),
+                use_container_width=True, hide_index=True,
             )
+    st.markdown("---")
+
+# ----------------- TIP-WISE SUMMARY (CACHED) -----------------
+# One TipSummary per (dataset version, BBM, month), shared by every session. It is
+# built once from the (BBM, TIP) index and the status log, then kept current:
+# each read pulls only the status rows written since the version it last saw
+# (store.changes_since) and adds those customers to their TIP's contacted
+# totals. If the change log cannot answer (a month was replaced, or the
+# summary fell too far behind), the contacted side is recounted from the
+# status maps.
+class TipSummary:
+    COLUMNS = [
+        "TIP_NAME_STD", "TOTAL_CUSTOMERS", "TOTAL_OUTSTANDING",
+        "CONTACTED", "CONTACTED_OUTSTANDING", "NOT_CONTACTED", "NOT_CONTACTED_OUTSTANDING",
+    ]
+
+    def __init__(self, df, bbm, positions_by_tip, month):
+        accounts = df[COL_OS_BA].astype(str).to_numpy()
+        amounts = df[COL_OS_AMOUNT].to_numpy()
+        self.bbm = bbm
+        self.month = month
+        self.accounts = {
+            tip: dict(zip(accounts[pos], amounts[pos].tolist()))
+            for tip, pos in positions_by_tip.items()
+        }
+        self.contacted = {tip: {} for tip in self.accounts}
+        self.status_version = None
+        self._display = None
+        self._lock = threading.Lock()
+
+    def refresh(self, store):
+        with self._lock:
+            if self.status_version == store.version:
+                return
+            rows = None
+            if self.status_version is not None:
+                version, rows = store.changes_since(self.status_version, self.bbm)
+            if rows is None:
+                version = store.version
+                for tip, accounts in self.accounts.items():
+                    status_map = store.status_map(tip, self.bbm, "OS", self.month)
+                    self.contacted[tip] = {
+                        acc: accounts[acc]
+                        for acc, (call, wa) in status_map.items()
+                        if (call or wa) and acc in accounts
+                    }
+                self._display = None
+            else:
+                for _, month, tip, _, src, acc, call, wa in rows:
+                    amount = self.accounts.get(tip, {}).get(acc)
+                    if (src == "OS" and month == self.month and (call or wa)
+                            and amount is not None and acc not in self.contacted[tip]):
+                        self.contacted[tip][acc] = amount
+                        self._display = None
+            self.status_version = version
+
+    def display_frame(self):
+        """Summary table with rupee columns formatted, rebuilt only after a
+        change."""
+        with self._lock:
+            if self._display is None:
+                rows = []
+                for tip, accounts in self.accounts.items():
+                    total = sum(accounts.values())
+                    done = sum(self.contacted[tip].values())
+                    n_done = len(self.contacted[tip])
+                    rows.append((tip, len(accounts), total, n_done, done, len(accounts) - n_done, total - done))
+                df = pd.DataFrame(rows, columns=self.COLUMNS).sort_values("TOTAL_OUTSTANDING", ascending=False)
+                for c in ("TOTAL_OUTSTANDING", "CONTACTED_OUTSTANDING", "NOT_CONTACTED_OUTSTANDING"):
+                    df[c] = df[c].map(lambda x: f"₹{x:,.2f}")
+                self._display = df
+            return self._display
+
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def tip_summary(os_version, og_version, bbm, month):
+    os_df, _ = shared_preprocessed(os_version, og_version, bbm)
+    positions = shared_group_index(os_version, og_version, bbm)["OS"].get(bbm, {})
+    return TipSummary(os_df, bbm, positions, month)
+
+
+# ----------------- LIVE TIP ACTIVITY (BBM) -----------------
+# The BBM's summary and activity feed re-run on their own every
+# STATUS_POLL_SECONDS. Each run asks the store only for the rows written
+# since the version this session last saw, so a TIP's click shows up within
+# seconds without reloading the page or re-reading the status log.
+STATUS_POLL_SECONDS = float(os.environ.get("TIPOS_STATUS_POLL_SECONDS", "10"))
+ACTIVITY_ROWS = 50
+ACTIVITY_COLS = ["TIME", "TIP_NAME_STD", "SOURCE: OS/OG", "ACCOUNT_NO", "ACTION"]
+
+def pull_tip_activity(bbm_name):
+    """Newest-first status rows for this BBM, kept in the session and
+    extended by the rows changed since the last poll."""
+    store = get_status_store()
+    seen = st.session_state.activity_version
+    if seen is None:
+        seen = max(store.sync() - 10 * ACTIVITY_ROWS, 0)
+    version, rows = store.changes_since(seen, bbm_name)
+    feed = st.session_state.tip_activity
+    if rows:
+        new = [
+            (max(call, wa), tip, src, acc, " + ".join(a for a, t in (("Call", call), ("WhatsApp", wa)) if t))
+            for _, _, tip, _, src, acc, call, wa in reversed(rows)
+        ]
+        feed = (new + feed)[:ACTIVITY_ROWS]
+    st.session_state.tip_activity = feed
+    st.session_state.activity_version = version
+    return feed
+
+@st.fragment(run_every=STATUS_POLL_SECONDS)
+def render_live_tip_status(bbm_name, has_os):
+    st.markdown("#### 📊 TIP-wise Outstanding Summary")
+    if has_os:
+        summary = tip_summary(os_version, og_version, _bbm_filter, CURRENT_MONTH)
+        summary.refresh(get_status_store())
+        st.dataframe(summary.display_frame(), use_container_width=True, hide_index=True)
+    else:
+        st.info("No OS data available to build TIP-wise summary.")
+
+    try:
+        feed = pull_tip_activity(bbm_name)
+    except Exception as e:
+        st.warning(f"Could not read recent TIP activity: {e}")
+        return
+    with st.expander(f"🔔 Recent TIP activity ({len(feed)})", expanded=False):
+        if feed:
+            st.dataframe(pd.DataFrame(feed, columns=ACTIVITY_COLS), use_container_width=True, hide_index=True)
+        else:
+            st.caption("No calls or WhatsApp messages recorded yet.")
 
-            c1, c2 = st.columns(2)
-            with c1:
-                if st.button("📞 Call Done", key=f"os_call_{idx}"):
-                    update_status(tip_name, "OS", acc_no, update_call=True)
-                    st.rerun()
-            with c2:
-                if st.button("🟢 WA Sent", key=f"os_wa_{idx}"):
-                    update_status(tip_name, "OS", acc_no, update_whatsapp=True)
-                    st.rerun()
-            st.write("")
 
 # ----------------- BBM VIEW -----------------
 def bbm_view():
@@ -700,82 +1862,242 @@ def bbm_view():
         st.info("No customer records for this BBM.")
         return
 
-    tip_list = sorted(
-        pd.concat([os_df["TIP_NAME_STD"], og_df["TIP_NAME_STD"]])
-        .dropna()
-        .unique()
-    )
-    selected_tip = st.selectbox("Select TIP", tip_list)
+    render_customer_search("bbm_find")
 
-    # -------- TIP-wise Outstanding Summary (OS only) --------
-    st.markdown("#### 📊 TIP-wise Outstanding Summary")
+    tip_list = tips_for_bbm(bbm_name)
+    selected_tip = st.selectbox("Select TIP", tip_list)
 
-    if not os_df.empty:
-        summary = (
-            os_df.groupby("TIP_NAME_STD", dropna=False)
-            .agg(
-                TOTAL_CUSTOMERS=(COL_OS_BA, "count"),
-                TOTAL_OUTSTANDING=(COL_OS_AMOUNT, "sum"),
-            )
-            .reset_index()
-            .sort_values("TOTAL_OUTSTANDING", ascending=False)
+    with st.expander("⬇️ Reports"):
+        st.markdown(f"**{selected_tip}**")
+        render_report_download(
+            f"{selected_tip} customers", ("TIP", bbm_name, selected_tip),
+            lambda: {src: tip_rows(df, src, bbm_name, selected_tip) for src, df in (("OS", os_df), ("OG", og_df))},
+            sum(len(group_index[src].get(bbm_name, {}).get(selected_tip, ())) for src in ("OS", "OG")),
+            f"bbm_tip_report_{selected_tip}",
         )
-
-        summary_display = summary.copy()
-        summary_display["TOTAL_OUTSTANDING"] = summary_display["TOTAL_OUTSTANDING"].map(
-            lambda x: f"₹{x:,.2f}"
+        st.markdown(f"**All TIPs of {bbm_name}**")
+        render_report_download(
+            f"{bbm_name} customers", ("BBM", bbm_name),
+            lambda: {"OS": os_df, "OG": og_df}, len(os_df) + len(og_df), "bbm_report",
         )
 
-        st.dataframe(summary_display, use_container_width=True, hide_index=True)
-    else:
-        st.info("No OS data available to build TIP-wise summary.")
+    # -------- Changes since the previous Outstanding List --------
+    render_upload_delta(bbm_name)
+
+    # -------- TIP-wise Outstanding Summary (OS only) + live activity --------
+    render_live_tip_status(bbm_name, not os_df.empty)
 
     st.markdown("---")
 
     # -------- Disconnected (OS) Customers for selected TIP --------
     st.markdown("#### 📴 Disconnected (OS) Customers")
 
-    tip_os = os_df[os_df["TIP_NAME_STD"] == selected_tip]
-    status_os = get_status_map(selected_tip, "OS")
+    tip_os = tip_rows(os_df, "OS", bbm_name, selected_tip)
 
     if tip_os.empty:
         st.info("No OS customers.")
-        return
+    else:
+        render_customer_list(tip_os, "OS", selected_tip, key_prefix=f"bbm_os_{selected_tip}")
 
-    for idx, r in tip_os.iterrows():
-        cust = r[COL_OS_CUST_NAME]
-        addr = r[COL_OS_ADDR]
-        mobile = r[COL_OS_MOBILE]
-        amount = r[COL_OS_AMOUNT]
-        acc = str(r[COL_OS_BA])
+    st.markdown("---")
 
-        ftth_no = str(r.get("FTTH_NO", "")).strip()
-        ftth_line = f"<br><b>FTTH No:</b> {ftth_no}" if ftth_no else ""
+    # -------- OG/IC Barred Customers for selected TIP --------
+    st.markdown("#### 🚫 OG/IC Barred Customers")
 
-        last_call, last_wa = status_os.get(acc, ("", ""))
-        bg = "#d4ffd4" if (last_call or last_wa) else "#fff7d4"
+    tip_og = tip_rows(og_df, "OG", bbm_name, selected_tip)
 
-        wa_msg = build_wa_message(cust, amount, acc, ftth_no)
+    if tip_og.empty:
+        st.info("No OG/IC barred customers.")
+    else:
+        render_customer_list(tip_og, "OG", selected_tip, key_prefix=f"bbm_og_{selected_tip}")
+
+
+# ----------------- MGMT VIEW -----------------
+# Circle-wide totals come from the per-TIP totals each upload records in
+# manifest.json (PartitionStore.group_totals) and the status store's running
+# called / WhatsApped counts, so the page reads a few hundred aggregate rows
+# instead of every customer in the circle. Both are kept current
+# incrementally: uploads replace their BBM's totals, clicks adjust the counts.
+AGG_COLS = ["OS_CUSTOMERS", "OS_OUTSTANDING", "OG_BARRED", "OG_OUTSTANDING"]
+COVERAGE_COLS = ["CALLED", "WHATSAPPED", "CONTACTED"]
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def circle_aggregates(os_version, og_version):
+    """One row per (BBM, TIP) with OS customers / outstanding and OG/IC
+    barred customers / outstanding."""
+    store = get_dataset_store()
+    records = {}
+    for source, (rows_col, amount_col), tip_col in (
+        ("OS", ("OS_CUSTOMERS", "OS_OUTSTANDING"), COL_OS_TIP_NAME),
+        ("OG", ("OG_BARRED", "OG_OUTSTANDING"), COL_OG_TIP_NAME),
+    ):
+        for bbm in store.bbms(source):
+            totals = store.group_totals(source, bbm, tip_col, SOURCE_COLS[source][4])
+            for tip, (n, amount) in totals.items():
+                rec = records.setdefault((bbm, tip), dict.fromkeys(AGG_COLS, 0))
+                rec[rows_col] += n
+                rec[amount_col] += amount
+    return pd.DataFrame(
+        [(bbm, tip, *(rec[c] for c in AGG_COLS)) for (bbm, tip), rec in records.items()],
+        columns=["BBM_STD", "TIP_NAME_STD"] + AGG_COLS,
+    )
 
-        st.markdown(
-            f"<div style='background:{bg};padding:8px;border-radius:6px;'>"
-            f"<b>{cust}</b> | Acc: {acc}{ftth_line}<br>{addr}<br>"
-            f"OS: ₹{amount:,.2f}<br>"
-            f"{make_tel_link(mobile)} "
-            f"{make_whatsapp_link(mobile, wa_msg)}"
-            f"<br><small>Call: {last_call or '-'} | WA: {last_wa or '-'}</small>"
-            f"</div>",
-            unsafe_allow_html=True,
-        )
 
-        c1, c2 = st.columns(2)
+def with_contact_coverage(agg):
+    """agg plus this month's CALLED / WHATSAPPED / CONTACTED OS customers."""
+    counts = get_status_store().contact_counts(CURRENT_MONTH)
+    cov = pd.DataFrame(
+        [(tip, bbm, *c) for (tip, bbm, src), c in counts.items() if src == "OS"],
+        columns=["TIP_NAME_STD", "BBM_STD"] + COVERAGE_COLS,
+    )
+    out = agg.merge(cov, on=["BBM_STD", "TIP_NAME_STD"], how="left")
+    for c in COVERAGE_COLS:
+        # The log can still hold customers who have since paid and left the list.
+        out[c] = out[c].fillna(0).astype(int).clip(upper=out["OS_CUSTOMERS"])
+    return out
+
+
+def coverage_table(df, by):
+    """Sum df over `by` and add % called / % WhatsApped, for display."""
+    out = df.groupby(by, observed=True)[AGG_COLS + COVERAGE_COLS].sum().reset_index()
+    customers = out["OS_CUSTOMERS"].where(out["OS_CUSTOMERS"] > 0)
+    out["CALLED_%"] = (out["CALLED"] / customers * 100).fillna(0).round(1)
+    out["WHATSAPP_%"] = (out["WHATSAPPED"] / customers * 100).fillna(0).round(1)
+    out = out.sort_values("OS_OUTSTANDING", ascending=False)
+    for c in ("OS_OUTSTANDING", "OG_OUTSTANDING"):
+        out[c] = out[c].map(lambda x: f"₹{x:,.2f}")
+    return out
+
+
+def render_upload_log_panel():
+    """Uploads with ingest speed, filterable by BBM / file type / month;
+    repeated uploads of the same file are flagged."""
+    log = get_upload_log()
+    everything = log.frame()
+    if everything.empty:
+        return
+    with st.expander(f"📥 Upload log ({len(everything):,} uploads)"):
+        c1, c2, c3 = st.columns(3)
         with c1:
-            if st.button("📞 Call Done", key=f"bbm_os_call_{selected_tip}_{idx}"):
-                update_status(selected_tip, "OS", acc, update_call=True)
-                st.rerun()
+            bbm = st.selectbox("BBM", ["All"] + sorted(everything["BBM_STD"].unique()), key="mgmt_log_bbm")
         with c2:
-            if st.button("🟢 WA Sent", key=f"bbm_os_wa_{selected_tip}_{idx}"):
-                update_status(selected_tip, "OS", acc, update_whatsapp=True)
+            file_type = st.selectbox("File", ["All", "OS", "OG"], key="mgmt_log_type")
+        with c3:
+            month = st.selectbox("Month", ["All"] + sorted(everything["MONTH"].unique(), reverse=True), key="mgmt_log_month")
+        df = log.frame(
+            bbm=None if bbm == "All" else bbm,
+            file_type=None if file_type == "All" else file_type,
+            month=None if month == "All" else month,
+        )
+        rows = pd.to_numeric(df["ROWS"], errors="coerce")
+        secs = pd.to_numeric(df["PARSE_SECONDS"], errors="coerce")
+        df["ROWS_PER_SEC"] = (rows / secs.where(secs > 0)).round(0)
+        seen = everything.loc[everything["SHA256"] != "", "SHA256"].value_counts()
+        df["DUPLICATE"] = df["SHA256"].map(seen).fillna(0).gt(1)
+        st.dataframe(
+            df.iloc[::-1].drop(columns=["SHA256"]),
+            use_container_width=True, hide_index=True,
+        )
+
+
+def mgmt_view():
+    st.subheader("📌 MGMT Dashboard – Circle")
+
+    agg = circle_aggregates(os_version, og_version)
+    if agg.empty:
+        st.info("No customer lists uploaded yet.")
+        return
+    agg = with_contact_coverage(agg)
+
+    customers = int(agg["OS_CUSTOMERS"].sum())
+    c1, c2, c3, c4, c5 = st.columns(5)
+    c1.metric("OS customers", f"{customers:,}")
+    c2.metric("Outstanding", f"₹{agg['OS_OUTSTANDING'].sum():,.2f}")
+    c3.metric("Called", f"{agg['CALLED'].sum() / customers * 100:.1f}%" if customers else "-")
+    c4.metric("WhatsApped", f"{agg['WHATSAPPED'].sum() / customers * 100:.1f}%" if customers else "-")
+    c5.metric("OG/IC barred", f"{int(agg['OG_BARRED'].sum()):,}")
+    st.caption(f"Contact coverage for {CURRENT_MONTH}, from the TIP call / WhatsApp log.")
+
+    st.markdown("---")
+    st.markdown("#### 🏢 BBM-wise Summary")
+    st.dataframe(coverage_table(agg, "BBM_STD"), use_container_width=True, hide_index=True)
+
+    render_upload_log_panel()
+
+    with st.expander("🔎 Find a customer (whole circle)"):
+        render_customer_search("mgmt_find")
+
+    with st.expander("⬇️ Circle report"):
+        render_report_download(
+            "Circle customers", ("CIRCLE",),
+            lambda: dict(zip(("OS", "OG"), shared_preprocessed(os_version, og_version, ""))),
+            int(agg["OS_CUSTOMERS"].sum() + agg["OG_BARRED"].sum()), "mgmt_report",
+        )
+
+    with st.expander("🗂️ Contact status log (all months)"):
+        render_status_log_download()
+
+    st.markdown("#### 👷 TIP-wise Summary")
+    bbm_choice = st.selectbox("BBM", ["All BBMs"] + sorted(agg["BBM_STD"].unique()), key="mgmt_bbm")
+    tip_agg = agg if bbm_choice == "All BBMs" else agg[agg["BBM_STD"] == bbm_choice]
+    st.dataframe(
+        coverage_table(tip_agg, ["BBM_STD", "TIP_NAME_STD"]),
+        use_container_width=True, hide_index=True,
+    )
+
+
+# ----------------- DIAGNOSTICS (MGMT) -----------------
+STAGE_LABELS = {
+    "ingest": "Excel parsing (upload)",
+    "persist": "Saving upload (background)",
+    "load": "Partition load",
+    "preprocess": "preprocess()",
+    "group_index": "(BBM, TIP) index",
+    "status_map": "Status log read",
+    "status_write": "Status log write",
+    "status_history": "Contact history query",
+    "status_sync": "Status change-log sync",
+    "search_index": "Search index build",
+    "search": "Customer search",
+    "priority_base": "Priority scores (per BBM)",
+    "priority_topk": "Priority top-k",
+    "export": "Report export",
+    "render": "Card rendering",
+    "script": "Whole rerun",
+}
+
+
+def render_diagnostics_panel():
+    if not metrics.enabled:
+        return
+    with st.expander("⏱️ Performance diagnostics (this server process)"):
+        stages, counters = metrics.snapshot()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Reruns", f"{counters.get('reruns', 0):,}")
+        c2.metric("Rows rendered", f"{counters.get('rows_rendered', 0):,}")
+        c3.metric("Status writes", f"{counters.get('status_writes', 0):,}")
+
+        if stages:
+            table = pd.DataFrame(
+                [
+                    (STAGE_LABELS.get(name, name), count, total, total / count * 1000, mx * 1000)
+                    for name, (count, total, mx) in stages.items()
+                ],
+                columns=["STAGE", "RUNS", "TOTAL_S", "MEAN_MS", "MAX_MS"],
+            ).sort_values("TOTAL_S", ascending=False)
+            st.dataframe(table.round(2), use_container_width=True, hide_index=True)
+        st.caption(f"Collecting since {datetime.fromtimestamp(metrics.started):%Y-%m-%d %H:%M}")
+
+        d1, d2 = st.columns(2)
+        with d1:
+            st.download_button(
+                "⬇️ Prometheus metrics", metrics.prometheus_text(),
+                file_name="tipos_metrics.prom", mime="text/plain",
+            )
+        with d2:
+            if st.button("Reset counters"):
+                metrics.reset()
                 st.rerun()
 
 
@@ -785,6 +2107,14 @@ if st.session_state.role == "TIP":
 elif st.session_state.role == "BBM":
     bbm_view()
 else:
-    st.info("MGMT view not included in this patch snippet. Keep your existing MGMT view below if present.")
+    mgmt_view()
+    render_diagnostics_panel()
+
+metrics.observe("script", time.perf_counter() - _script_started)
+if METRICS_FILE:
+    try:
+        metrics.maybe_write(METRICS_FILE)
+    except Exception as e:
+        st.warning(f"Could not write metrics file {METRICS_FILE}: {e}")
 
 
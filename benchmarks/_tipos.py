@@ -0,0 +1,50 @@
+"""Load the data-layer functions of TIPOS.py without running the Streamlit UI.
+
+TIPOS.py is a Streamlit script, so importing it would render the login page.
+For benchmarking we only need its constants and pure functions: this module
+executes the top-level imports, UPPER_CASE constants, ``def``s (with the
+st.cache_* decorators dropped) and classes, and skips every other statement.
+"""
+import ast
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def load_tipos(path=os.path.join(ROOT, "TIPOS.py")):
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    keep = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            keep.append(node)
+        elif isinstance(node, ast.Try) and all(
+            isinstance(b, (ast.Import, ast.ImportFrom, ast.Assign)) for b in node.body
+        ):
+            keep.append(node)
+        elif isinstance(node, ast.Assign) and all(
+            isinstance(t, ast.Name) and t.id.isupper() for t in node.targets
+        ):
+            keep.append(node)
+        elif isinstance(node, ast.FunctionDef):
+            node.decorator_list = []
+            keep.append(node)
+        elif isinstance(node, ast.ClassDef):
+            keep.append(node)
+
+    ns = {"__name__": "tipos_bench", "__file__": path}
+    for node in keep:
+        code = compile(ast.Module(body=[node], type_ignores=[]), path, "exec")
+        try:
+            exec(code, ns)
+        except Exception:
+            # Constants computed from session state etc. are not needed here.
+            pass
+    # Module-level objects the functions reference but the loader skips.
+    from perf_metrics import Metrics
+    ns.setdefault("metrics", Metrics(enabled=False))
+    return ns
@@ -0,0 +1,250 @@
+"""End-to-end timing of the dashboard's data path on synthetic workbooks.
+
+For each size, generates (or reuses) a deterministic Outstanding / Barred
+workbook pair and a pre-filled status history (see synthetic.py), then times
+the stages a BBM upload and a TIP / BBM / MGMT page view go through:
+
+    ingest        read_projected_sheet over 'Total OS' + 'PRIVATE OS' and the Barred list
+    partition     PartitionStore.write_upload (per-BBM Parquet + manifest)
+    load_bbm      one BBM's newest partitions      (TIP / BBM login)
+    load_circle   every BBM's partitions           (MGMT login)
+    preprocess_*  preprocess() for the same two views
+    group_index   (BBM, TIP) row index over the circle
+    status_seed   status history into a fresh SQLite store
+    status_map    get_status_map for the biggest TIP (cold month load, then warm)
+    update_status one "Call Done" upsert (median)
+    status_history  6-month contact history for the biggest TIP's customers
+    priority_base   PriorityRanker scores for the biggest BBM (incl. its history query)
+    priority_topk   first page of the biggest TIP's worklist (top-k, median)
+    render_page   tip_rows + select_rows + one page of card HTML
+    render_all    card HTML for every customer of the biggest TIP
+
+Wall time is perf_counter; peak memory is tracemalloc's peak over the stage
+(Python allocations only, Arrow buffers are not counted). Everything runs
+offline in temp dirs. Results go to a JSON file for comparing runs:
+
+    python benchmarks/bench_pipeline.py --sizes 1000 10000 100000 [--out results.json]
+    python benchmarks/bench_pipeline.py --sizes 1000000 --no-memory
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+from _tipos import load_tipos  # noqa: E402
+
+from dataset_store import PartitionStore  # noqa: E402
+from status_store import SqliteStatusStore  # noqa: E402
+
+PAGE_SIZE = 25
+CLICKS = 20
+
+
+class StageTimer:
+    def __init__(self, rows, track_memory=True):
+        self.rows = rows
+        self.track_memory = track_memory
+        self.results = []
+
+    def run(self, stage, fn, *args, **kwargs):
+        if self.track_memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        try:
+            out = fn(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1] if self.track_memory else None
+            if self.track_memory:
+                tracemalloc.stop()
+        self.results.append({
+            "rows": self.rows,
+            "stage": stage,
+            "seconds": round(seconds, 6),
+            "peak_mb": None if peak is None else round(peak / (1024 * 1024), 2),
+        })
+        return out
+
+    def median(self, stage, fn, repeat):
+        times = []
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            fn(i)
+            times.append(time.perf_counter() - t0)
+        times.sort()
+        self.results.append({
+            "rows": self.rows, "stage": stage,
+            "seconds": round(times[len(times) // 2], 6), "peak_mb": None,
+        })
+
+
+def fixture_paths(data_dir, rows, seed):
+    """Workbooks are expensive to write at 1M rows, so keep them between runs."""
+    os.makedirs(data_dir, exist_ok=True)
+    os_path = os.path.join(data_dir, f"Outstanding_{rows}_s{seed}.xlsx")
+    og_path = os.path.join(data_dir, f"Barred_{rows}_s{seed}.xlsx")
+    if not (os.path.exists(os_path) and os.path.exists(og_path)):
+        os_full = synthetic.make_outstanding(rows, seed)
+        synthetic.write_outstanding_xlsx(os_full, os_path + ".tmp.xlsx")
+        synthetic.write_barred_xlsx(synthetic.make_barred(os_full, seed), og_path + ".tmp.xlsx")
+        os.replace(os_path + ".tmp.xlsx", os_path)
+        os.replace(og_path + ".tmp.xlsx", og_path)
+    return os_path, og_path
+
+
+def bench_size(T, rows, seed, data_dir, track_memory):
+    os_path, og_path = fixture_paths(data_dir, rows, seed)
+    timer = StageTimer(rows, track_memory)
+    month = T["CURRENT_MONTH"]
+
+    def ingest():
+        os_df = pd.concat([
+            T["read_projected_sheet"](os_path, "Total OS", T["OS_INGEST_COLS"])[0],
+            T["read_projected_sheet"](os_path, "PRIVATE OS", T["OS_INGEST_COLS"])[0],
+        ], ignore_index=True)
+        og_sheet = T["workbook_sheet_names"](og_path)[1]
+        og_df = T["read_projected_sheet"](og_path, og_sheet, T["OG_INGEST_COLS"])[0]
+        return os_df, og_df
+
+    os_raw, og_raw = timer.run("ingest", ingest)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PartitionStore(os.path.join(tmp, "monthly_data"))
+
+        def partition():
+            for source, df, bbm_col in (("OS", os_raw, T["COL_OS_BBM"]), ("OG", og_raw, T["COL_OG_BBM"])):
+                col_ba, _, _, _, col_amount = T["SOURCE_COLS"][source]
+                store.write_upload(source, df, bbm_col, month, {"uploaded_by": "bench"},
+                                   key_col=col_ba, amount_col=col_amount)
+
+        timer.run("partition", partition)
+
+        bbm = max(store.bbms("OS"), key=lambda b: store.latest_entry("OS", b)["rows"])
+
+        def load(bbm_filter):
+            if bbm_filter:
+                return store.read("OS", bbm_filter), store.read("OG", bbm_filter)
+            return tuple(
+                pd.concat([store.read(src, b) for b in store.bbms(src)], ignore_index=True)
+                for src in ("OS", "OG")
+            )
+
+        bbm_os, bbm_og = timer.run("load_bbm", load, bbm)
+        all_os, all_og = timer.run("load_circle", load, "")
+
+        bbm_frames = dict(zip(("OS", "OG"), timer.run("preprocess_bbm", T["preprocess"], bbm_os, bbm_og, bbm)))
+        os_df, og_df = timer.run("preprocess_circle", T["preprocess"], all_os, all_og, "")
+        del bbm_os, bbm_og, all_os, all_og
+
+        def group_index():
+            groups = {"OS": T["build_group_index"](os_df), "OG": T["build_group_index"](og_df)}
+            tips = {}
+            for by_bbm in groups.values():
+                for b, by_tip in by_bbm.items():
+                    tips.setdefault(b, set()).update(by_tip)
+            groups["TIPS"] = {b: sorted(names) for b, names in tips.items()}
+            return groups
+
+        T["group_index"] = timer.run("group_index", group_index)
+        by_tip = T["group_index"]["OS"][bbm]
+        tip = max(by_tip, key=lambda t: len(by_tip[t]))
+
+        status = SqliteStatusStore(os.path.join(tmp, "status.db"))
+        history = synthetic.make_status_history(synthetic.make_outstanding(rows, seed), month, seed)
+        timer.run("status_seed", status.upsert_many, history)
+        status.close()
+
+        status = SqliteStatusStore(os.path.join(tmp, "status.db"))
+        timer.run("status_map_cold", status.status_map, tip, bbm, "OS", month)
+        timer.median("status_map_warm", lambda i: status.status_map(tip, bbm, "OS", month), CLICKS)
+        timer.median("update_status", lambda i: status.upsert(
+            tip, bbm, "OS", str(8_000_000_000 + i), month, call_time="2025-12-02 11:00",
+        ), CLICKS)
+
+        col_ba = T["SOURCE_COLS"]["OS"][0]
+        status_map = status.status_map(tip, bbm, "OS", month)
+
+        tip_accounts = T["tip_rows"](os_df, "OS", bbm, tip)[col_ba].astype(str).tolist()
+        since = str(pd.Period(month, freq="M") - 5)
+        timer.run("status_history", status.contact_history, "OS", tip_accounts, since)
+
+        def priority_base():
+            accounts = {src: df[T["SOURCE_COLS"][src][0]].astype(str) for src, df in bbm_frames.items()}
+            both = set(accounts["OS"]) & set(accounts["OG"])
+            links = {"OS": dict.fromkeys(both, ""), "OG": dict.fromkeys(both, "")}
+            histories = {src: status.contact_history(src, accounts[src].tolist(), since) for src in accounts}
+            return T["PriorityRanker"](bbm_frames, links, histories, month)
+
+        ranker = timer.run("priority_base", priority_base)
+        tip_bbm_df = bbm_frames["OS"][bbm_frames["OS"]["TIP_NAME_STD"] == tip]
+        timer.median("priority_topk", lambda i: ranker.top(
+            "OS", tip_bbm_df, status_map, PAGE_SIZE, status.version,
+        ), CLICKS)
+
+        def cards(page_df):
+            return [
+                T["customer_card_html"](body, *status_map.get(acc, ("", "")))
+                for acc, body in zip(page_df[col_ba].map(str), T["card_bodies"](page_df, "OS"))
+            ]
+
+        def render_page():
+            tip_df = T["tip_rows"](os_df, "OS", bbm, tip)
+            rows_ = T["select_rows"](tip_df, "OS", status_map, "Outstanding: high → low", "Not contacted")
+            return cards(rows_.iloc[:PAGE_SIZE])
+
+        timer.run("render_page", render_page)
+        timer.run("render_all", lambda: cards(T["tip_rows"](os_df, "OS", bbm, tip)))
+        status.close()
+
+    print(f"  {rows:,} rows: biggest BBM {bbm!r}, biggest TIP {tip!r} ({len(by_tip[tip]):,} OS rows)")
+    return timer.results
+
+
+def print_table(results):
+    print(f"{'rows':>9}  {'stage':<18} {'ms':>11}  {'peak MB':>8}")
+    for r in results:
+        peak = "-" if r["peak_mb"] is None else f"{r['peak_mb']:.1f}"
+        print(f"{r['rows']:>9}  {r['stage']:<18} {r['seconds'] * 1000:>11.2f}  {peak:>8}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "tipos_bench_data"),
+                    help="where generated workbooks are kept between runs")
+    ap.add_argument("--out", default=f"bench_pipeline_{datetime.now():%Y%m%d_%H%M%S}.json")
+    ap.add_argument("--no-memory", action="store_true",
+                    help="skip tracemalloc (it slows large runs down several times)")
+    args = ap.parse_args()
+
+    T = load_tipos()
+    results = []
+    for rows in args.sizes:
+        results.extend(bench_size(T, rows, args.seed, args.data_dir, not args.no_memory))
+
+    print_table(results)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "seed": args.seed,
+            "page_size": PAGE_SIZE,
+            "results": results,
+        }, f, indent=1)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
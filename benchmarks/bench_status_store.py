@@ -0,0 +1,62 @@
+"""Per-click cost of the status backends as history grows.
+
+Seeds each backend with N existing rows, then times single "Call Done"
+upserts. The SQLite backend should stay flat; the xlsx backend grows with N.
+
+    python benchmarks/bench_status_store.py [--sizes 1000 10000 50000] [--clicks 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from status_store import SqliteStatusStore, XlsxStatusStore  # noqa: E402
+
+MONTH = "2025-12"
+
+
+def seed_rows(n):
+    for i in range(n):
+        yield (f"TIP {i % 150}", f"BBM {i % 11}", "OS", str(9000000000 + i), MONTH,
+               "2025-12-01 10:00", "")
+
+
+def time_clicks(store, clicks):
+    times = []
+    for i in range(clicks):
+        t0 = time.perf_counter()
+        store.upsert("TIP 1", "BBM 1", "OS", str(9100000000 + i), MONTH,
+                     call_time="2025-12-02 11:00")
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    ap.add_argument("--clicks", type=int, default=20)
+    ap.add_argument("--skip-xlsx", action="store_true", help="only benchmark SQLite")
+    args = ap.parse_args()
+
+    print(f"{'rows':>8}  {'sqlite ms/click':>16}  {'xlsx ms/click':>14}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            sql = SqliteStatusStore(os.path.join(tmp, "status.db"))
+            sql.upsert_many(seed_rows(n))
+            sql_ms = time_clicks(sql, args.clicks) * 1000
+            sql.close()
+
+            xlsx_ms = float("nan")
+            if not args.skip_xlsx:
+                xl = XlsxStatusStore(os.path.join(tmp, "status.xlsx"))
+                xl.upsert_many(seed_rows(n))
+                xlsx_ms = time_clicks(xl, max(3, args.clicks // 5)) * 1000
+        print(f"{n:>8}  {sql_ms:>16.2f}  {xlsx_ms:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
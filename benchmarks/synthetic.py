@@ -0,0 +1,164 @@
+"""Deterministic synthetic Outstanding / Barred workbooks and status history.
+
+The shapes follow the real billing exports: an Outstanding workbook with
+'Total OS' and 'PRIVATE OS' sheets (plus the unused columns the exports
+carry), a Barred workbook whose 2nd sheet is the OG/IC Barred List, and a
+few months of TIP contact history. TIP and BBM sizes are skewed (a few big
+BBMs / TIPs, a long tail, and a '#' placeholder TIP) like the live data.
+
+    python benchmarks/synthetic.py --rows 10000 --out /tmp/tipos_synth
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+N_BBMS = 11
+TIPS_PER_BBM = (4, 24)
+HISTORY_MONTHS = 6
+
+
+def _skewed_weights(rng, n, a=1.3):
+    w = 1.0 / np.arange(1, n + 1) ** a
+    rng.shuffle(w)
+    return w / w.sum()
+
+
+def make_hierarchy(rng):
+    """[(bbm, [tip, ...])] with skewed per-BBM TIP counts."""
+    bbms = [f"BBM {chr(65 + i)} KUMAR" for i in range(N_BBMS)]
+    hierarchy = []
+    for b, bbm in enumerate(bbms):
+        n_tips = int(rng.integers(*TIPS_PER_BBM))
+        tips = [f"M/s. TIP {b:02d}-{t:02d} CABLE NETWORK" for t in range(n_tips)] + ["#"]
+        hierarchy.append((bbm, tips))
+    return hierarchy
+
+
+def make_outstanding(rows, seed=0):
+    """Full-width Outstanding List frame (all the export's columns)."""
+    rng = np.random.default_rng(seed)
+    hierarchy = make_hierarchy(rng)
+    bbm_w = _skewed_weights(rng, len(hierarchy), a=0.8)
+    bbm_idx = rng.choice(len(hierarchy), size=rows, p=bbm_w)
+
+    tips = np.empty(rows, dtype=object)
+    for b, (_, tip_names) in enumerate(hierarchy):
+        sel = np.flatnonzero(bbm_idx == b)
+        w = _skewed_weights(rng, len(tip_names))
+        tips[sel] = np.asarray(tip_names, dtype=object)[rng.choice(len(tip_names), size=len(sel), p=w)]
+
+    accounts = 9_000_000_000 + rng.choice(1_000_000_000, size=rows, replace=False)
+    mobiles = rng.integers(6_000_000_000, 9_999_999_999, size=rows).astype(float)
+    mobiles[rng.random(rows) < 0.04] = np.nan
+    amounts = np.round(rng.lognormal(mean=7.2, sigma=1.1, size=rows), 2)
+
+    return pd.DataFrame({
+        "DE": rng.choice(["M Rammohan", "G Dayakar", "K Srinivas"], size=rows),
+        "BBM": np.asarray([h[0] for h in hierarchy], dtype=object)[bbm_idx],
+        "Maintanance Franchisee Name": tips,
+        "Exchange_Code": rng.choice(["WGLREC", "WGLPCY", "WGLMBB", "WGLHNK"], size=rows),
+        "Billing_Account_Number": accounts,
+        "Telephone_Number": [f"0870-2{n:06d}" for n in rng.integers(0, 999_999, size=rows)],
+        "Mobile_Number": mobiles,
+        "Email": [f"user{n}@example.com" for n in range(rows)],
+        "First_Name": [f"CUSTOMER {n}" for n in rng.integers(0, rows * 3, size=rows)],
+        "OS_Amount(Rs)": amounts,
+        "Whether to open BroadBand": rng.choice(["Y", "N"], size=rows),
+        "Address": [f"{n}-{n % 97}/B, COLONY {n % 311}, HANAMKONDA, WARANGAL, TS, India"
+                    for n in rng.integers(1, 99_999, size=rows)],
+        "Service_start_Date": pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, size=rows), unit="D"),
+        "Rural_Urban": rng.choice(["Rural", "Urban"], size=rows),
+        "Account_Type": rng.choice(["INDIVIDUAL", "BUSINESS"], size=rows, p=[0.9, 0.1]),
+        "Category": "Private",
+        "Main product name": rng.choice(["BHARAT FIBER VOICE", "FIXED LANDLINE"], size=rows),
+        "Deposit_Money": np.nan,
+    })
+
+
+def make_barred(os_df, seed=0, overlap=0.3):
+    """OG/IC Barred List: ~`overlap` of OS accounts plus new ones."""
+    rng = np.random.default_rng(seed + 1)
+    rows = max(1, len(os_df) // 3)
+    take = os_df.sample(n=min(len(os_df), int(rows * overlap)), random_state=seed)
+    extra = make_outstanding(rows - len(take), seed=seed + 2) if rows > len(take) else os_df.iloc[0:0]
+    src = pd.concat([take, extra], ignore_index=True)
+    return pd.DataFrame({
+        "Maintenance Fanchisee Name": src["Maintanance Franchisee Name"],
+        "BBM": src["BBM"],
+        "Account Number": src["Billing_Account_Number"],
+        "Mobile Number": src["Mobile_Number"],
+        "Customer Name": src["First_Name"],
+        "ADDRESS": src["Address"],
+        "OutStanding": np.round(src["OS_Amount(Rs)"] * rng.uniform(0.8, 1.2, size=len(src)), 2),
+        "Barring Date": "2025-11-02",
+    })
+
+
+def make_status_history(os_df, current_month, seed=0, months=HISTORY_MONTHS):
+    """Rows for status_store.upsert_many: past months + ~40% of this month."""
+    rng = np.random.default_rng(seed + 3)
+    period = pd.Period(current_month, freq="M")
+    accounts = os_df["Billing_Account_Number"].astype(str).to_numpy()
+    tips = os_df["Maintanance Franchisee Name"].astype(str).str.upper().to_numpy()
+    bbms = os_df["BBM"].astype(str).str.upper().to_numpy()
+    for back in range(months, -1, -1):
+        month = str(period - back)
+        share = 0.4 if back == 0 else 0.6
+        for i in np.flatnonzero(rng.random(len(os_df)) < share):
+            call = f"{month}-{rng.integers(1, 28):02d} 1{rng.integers(0, 9)}:00"
+            wa = call if rng.random() < 0.5 else ""
+            yield tips[i], bbms[i], "OS", accounts[i], month, call, wa
+
+
+def _write_sheet(wb, name, df):
+    """Row-by-row so xlsxwriter's constant_memory mode can flush as it goes."""
+    ws = wb.add_worksheet(name)
+    ws.write_row(0, 0, [str(c) for c in df.columns])
+    cols = []
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = s.dt.strftime("%d-%m-%Y")
+        cols.append(s.astype(object).where(s.notna(), None).tolist())
+    for r, row in enumerate(zip(*cols), start=1):
+        ws.write_row(r, 0, row)
+
+
+def write_outstanding_xlsx(os_df, path):
+    import xlsxwriter
+    split = int(len(os_df) * 0.8)
+    wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+    _write_sheet(wb, "Total OS", os_df.iloc[:split])
+    _write_sheet(wb, "PRIVATE OS", os_df.iloc[split:])
+    wb.close()
+    return path
+
+
+def write_barred_xlsx(og_df, path):
+    import xlsxwriter
+    summary = og_df.groupby("BBM").size().rename("COUNT").reset_index()
+    wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+    _write_sheet(wb, "Summary", summary)
+    _write_sheet(wb, "OG IC Barred List", og_df)
+    wb.close()
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", type=int, default=10000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="synthetic_data")
+    args = ap.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    os_df = make_outstanding(args.rows, args.seed)
+    og_df = make_barred(os_df, args.seed)
+    print(write_outstanding_xlsx(os_df, os.path.join(args.out, f"Outstanding_{args.rows}.xlsx")))
+    print(write_barred_xlsx(og_df, os.path.join(args.out, f"Barred_{args.rows}.xlsx")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Per-month, per-BBM partitioned store for the uploaded customer lists.
+
+Layout (under ``root``, normally ``monthly_data/``)::
+
+    manifest.json
+    <YYYY-MM>/<BBM>/Outstanding.<fingerprint>.parquet
+    <YYYY-MM>/<BBM>/Barred.<fingerprint>.parquet
+
+An upload is split on its BBM column and each BBM's rows become one
+partition, so a TIP or BBM login reads one small Parquet file instead of the
+whole circle. ``manifest.json`` records, per source ("OS" / "OG") and
+partition, the file, row count, content fingerprint and who uploaded it;
+the newest month present for a BBM is the one the dashboard shows.
+
+Partition files are named after their content fingerprint and never
+overwritten: an upload writes new files, then swaps ``manifest.json`` (the
+only commit point), then deletes the files it superseded. A reader asks for
+a partition by the fingerprint it saw in the manifest (``read(...,
+fingerprint)``), so it gets that version or an error, never a newer file
+under an older key.
+
+When an upload replaces a BBM's previous partition (same month re-upload or
+the next month), the two are hash-joined on the account number and only the
+differences are written next to the new partition as
+``<Outstanding|Barred>.<fingerprint>.delta.parquet`` (ACCOUNT_NO, CHANGE, OLD_AMOUNT,
+NEW_AMOUNT), with CHANGE one of ADDED / REMOVED (paid) / AMOUNT_CHANGED.
+
+With a group column (the TIP name), each manifest entry also carries
+``groups``: {TIP: [rows, amount]} totals computed at upload time, so
+circle-wide summaries never have to open the partitions.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+MANIFEST_NAME = "manifest.json"
+SOURCE_FILES = {"OS": "Outstanding.parquet", "OG": "Barred.parquet"}
+DELTA_COLS = ["ACCOUNT_NO", "CHANGE", "OLD_AMOUNT", "NEW_AMOUNT"]
+UNASSIGNED_BBM = "UNASSIGNED"  # rows with a blank BBM column (MGMT only)
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parquet_safe(df):
+    """Parquet needs one type per column: mixed object columns (e.g. phone
+    numbers read as int in some rows, text in others) are stored as text."""
+    out = df.copy()
+    out.columns = [str(c) for c in out.columns]
+    for c in out.columns:
+        if out[c].dtype == object:
+            out[c] = out[c].map(lambda v: v if pd.isna(v) else str(v)).astype(object)
+    return out
+
+
+def bbm_key(value):
+    """Partition key for a BBM cell, matching preprocess()'s BBM_STD."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return UNASSIGNED_BBM
+    s = str(value).strip().upper()
+    return s if s and s != "NAN" else UNASSIGNED_BBM
+
+
+def account_key(series):
+    """Account numbers as text without a trailing '.0' ("" for blanks)."""
+    s = series.astype(object).where(series.notna(), "")
+    return s.map(str).str.strip().str.replace(r"\.0$", "", regex=True)
+
+
+def _amounts_by_account(df, key_col, amount_col):
+    keys = account_key(df[key_col]) if key_col in df.columns else pd.Series(dtype=object)
+    amounts = (
+        pd.to_numeric(df[amount_col], errors="coerce").fillna(0)
+        if amount_col in df.columns else pd.Series(0.0, index=df.index)
+    )
+    out = pd.DataFrame({"ACCOUNT_NO": keys, "AMOUNT": amounts})
+    out = out[out["ACCOUNT_NO"] != ""]
+    return out.groupby("ACCOUNT_NO", sort=False)["AMOUNT"].sum()
+
+
+def compute_delta(old, new, key_col, amount_col):
+    """Hash-join two versions of a partition on the account number.
+
+    Returns DELTA_COLS rows for accounts that were added, removed (paid) or
+    whose outstanding amount changed by at least one paisa.
+    """
+    old_amt = _amounts_by_account(old, key_col, amount_col).rename("OLD_AMOUNT")
+    new_amt = _amounts_by_account(new, key_col, amount_col).rename("NEW_AMOUNT")
+    joined = pd.concat([old_amt, new_amt], axis=1, join="outer")
+    joined.index.name = "ACCOUNT_NO"
+    joined = joined.reset_index()
+
+    in_old = joined["OLD_AMOUNT"].notna()
+    in_new = joined["NEW_AMOUNT"].notna()
+    changed = in_old & in_new & ((joined["OLD_AMOUNT"] - joined["NEW_AMOUNT"]).abs() >= 0.005)
+    joined["CHANGE"] = None
+    joined.loc[in_new & ~in_old, "CHANGE"] = "ADDED"
+    joined.loc[in_old & ~in_new, "CHANGE"] = "REMOVED"
+    joined.loc[changed, "CHANGE"] = "AMOUNT_CHANGED"
+    delta = joined[joined["CHANGE"].notna()]
+    return delta[DELTA_COLS].reset_index(drop=True)
+
+
+def group_key(series):
+    """TIP names as preprocess() standardises them (TIP_NAME_STD)."""
+    return series.astype(str).str.strip().str.upper().fillna("")
+
+
+def group_totals(df, group_col, amount_col):
+    """{group: [rows, amount]} for one partition."""
+    if df.empty or group_col not in df.columns:
+        return {}
+    amounts = (
+        pd.to_numeric(df[amount_col], errors="coerce").fillna(0)
+        if amount_col in df.columns else pd.Series(0.0, index=df.index)
+    )
+    agg = amounts.groupby(group_key(df[group_col]), sort=False).agg(["size", "sum"])
+    return {str(k): [int(n), round(float(a), 2)] for k, (n, a) in agg.iterrows()}
+
+
+def _dirname(bbm):
+    s = str(bbm)
+    for ch in [":", "\\", "/", "?", "*", "[", "]", "<", ">", "|", '"']:
+        s = s.replace(ch, "-")
+    return s.strip() or UNASSIGNED_BBM
+
+
+def _write_json_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class PartitionStore:
+    def __init__(self, root):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._manifest_mtime = None
+
+    # ---- manifest ----
+    def manifest(self):
+        """{"OS": {month: {bbm: entry}}, "OG": {...}}, re-read only when the
+        file changes on disk."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return {"OS": {}, "OG": {}}
+        if self._manifest is None or mtime != self._manifest_mtime:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for src in SOURCE_FILES:
+                data.setdefault(src, {})
+            self._manifest, self._manifest_mtime = data, mtime
+        return self._manifest
+
+    def has_source(self, source):
+        return any(self.manifest()[source].values())
+
+    def latest_entry(self, source, bbm):
+        """Manifest entry of the newest month holding `bbm`, or None."""
+        months = self.manifest()[source]
+        for month in sorted(months, reverse=True):
+            entry = months[month].get(bbm)
+            if entry:
+                return dict(entry, month=month)
+        return None
+
+    def entry(self, source, bbm, fingerprint=None):
+        """Manifest entry of bbm's partition with this fingerprint (default:
+        the newest). Raises LookupError if that version has been replaced."""
+        if not fingerprint:
+            return self.latest_entry(source, bbm)
+        months = self.manifest()[source]
+        for month in sorted(months, reverse=True):
+            entry = months[month].get(bbm)
+            if entry and entry["fingerprint"] == fingerprint:
+                return dict(entry, month=month)
+        raise LookupError(f"{source} partition {bbm} {fingerprint[:12]} has been replaced")
+
+    def bbms(self, source):
+        """Every BBM with at least one partition for source."""
+        return sorted({b for parts in self.manifest()[source].values() for b in parts})
+
+    def version(self, source, bbm=""):
+        """Content version of what a login with this BBM filter would see.
+        bbm="" (MGMT) covers the newest partition of every BBM."""
+        if bbm:
+            entry = self.latest_entry(source, bbm)
+            return entry["fingerprint"] if entry else ""
+        parts = [(b, self.latest_entry(source, b)) for b in self.bbms(source)]
+        parts = [f"{b}:{e['fingerprint']}" for b, e in parts if e]
+        if not parts:
+            return ""
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    # ---- read ----
+    def read(self, source, bbm, fingerprint=None):
+        entry = self.entry(source, bbm, fingerprint)
+        if entry is None:
+            return None
+        return pd.read_parquet(os.path.join(self.root, entry["file"]))
+
+    def read_delta(self, source, bbm, fingerprint=None):
+        """Delta of the BBM's partition (default: the newest) against the one
+        it replaced (DELTA_COLS frame), or None for a first upload."""
+        entry = self.entry(source, bbm, fingerprint)
+        if not entry or not entry.get("delta"):
+            return None
+        return pd.read_parquet(os.path.join(self.root, entry["delta"]["file"]))
+
+    def group_totals(self, source, bbm, group_col, amount_col):
+        """{group: [rows, amount]} of the BBM's newest partition, from the
+        manifest when the upload recorded it (else read once from Parquet)."""
+        entry = self.latest_entry(source, bbm)
+        if entry is None:
+            return {}
+        if "groups" in entry:
+            return entry["groups"]
+        df = pd.read_parquet(os.path.join(self.root, entry["file"]))
+        return group_totals(df, group_col, amount_col)
+
+    # ---- write ----
+    def _write_parquet(self, df, dir_rel, stem, suffix=".parquet"):
+        """Write df as <dir_rel>/<stem>.<fingerprint[:16]><suffix>; returns
+        (relative path, fingerprint). Same content, same name, so an existing
+        file is only ever replaced by identical bytes."""
+        tmp = os.path.join(self.root, dir_rel, stem + suffix + ".tmp")
+        df.to_parquet(tmp, index=False)
+        fingerprint = file_fingerprint(tmp)
+        rel = os.path.join(dir_rel, f"{stem}.{fingerprint[:16]}{suffix}")
+        os.replace(tmp, os.path.join(self.root, rel))
+        return rel, fingerprint
+
+    def _remove_superseded(self, source, month, bbm, manifest):
+        """Delete source's files in the partition directory that the manifest
+        no longer points to (caller holds the lock, after the manifest swap)."""
+        entry = manifest[source].get(str(month), {}).get(bbm) or {}
+        keep = {entry.get("file"), (entry.get("delta") or {}).get("file")}
+        dir_rel = os.path.join(str(month), _dirname(bbm))
+        stem = SOURCE_FILES[source][: -len(".parquet")] + "."
+        for name in os.listdir(os.path.join(self.root, dir_rel)):
+            if name.startswith(stem) and name.endswith(".parquet") and os.path.join(dir_rel, name) not in keep:
+                try:
+                    os.remove(os.path.join(self.root, dir_rel, name))
+                except OSError:
+                    pass
+
+    def write_upload(self, source, df, bbm_col, month, meta=None, key_col=None, amount_col=None,
+                     group_col=None):
+        """Split df on bbm_col and store one partition per BBM for month.
+
+        With key_col / amount_col, each partition is also diffed against the
+        BBM's previous partition (see compute_delta); with group_col, its
+        per-group totals are stored in the manifest. Returns {bbm: rows}.
+        Partitions of BBMs not present in df are left untouched.
+        """
+        meta = dict(meta or {})
+        keys = df[bbm_col].map(bbm_key) if bbm_col in df.columns else pd.Series(UNASSIGNED_BBM, index=df.index)
+        safe = parquet_safe(df)
+        written = {}
+        entries = {}
+        stem = SOURCE_FILES[source][: -len(".parquet")]
+        for bbm, idx in keys.groupby(keys, sort=True).groups.items():
+            dir_rel = os.path.join(str(month), _dirname(bbm))
+            os.makedirs(os.path.join(self.root, dir_rel), exist_ok=True)
+            part = safe.loc[idx].reset_index(drop=True)
+
+            delta_info = None
+            previous = self.latest_entry(source, bbm)
+            if key_col and previous:
+                delta = compute_delta(
+                    pd.read_parquet(os.path.join(self.root, previous["file"])), part, key_col, amount_col,
+                )
+                delta_rel, _ = self._write_parquet(delta, dir_rel, stem, ".delta.parquet")
+                counts = delta["CHANGE"].value_counts()
+                delta_info = {
+                    "file": delta_rel,
+                    "base_month": previous["month"],
+                    "base_fingerprint": previous["fingerprint"],
+                    "added": int(counts.get("ADDED", 0)),
+                    "removed": int(counts.get("REMOVED", 0)),
+                    "changed": int(counts.get("AMOUNT_CHANGED", 0)),
+                }
+
+            rel, fingerprint = self._write_parquet(part, dir_rel, stem)
+            entries[bbm] = dict(meta, file=rel, rows=int(len(part)), fingerprint=fingerprint)
+            if delta_info:
+                entries[bbm]["delta"] = delta_info
+            if group_col:
+                entries[bbm]["groups"] = group_totals(part, group_col, amount_col)
+            written[bbm] = int(len(part))
+
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            self._manifest = None  # re-read under the lock: other uploads may have landed
+            manifest = json.loads(json.dumps(self.manifest()))
+            manifest[source].setdefault(str(month), {}).update(entries)
+            _write_json_atomic(self.manifest_path, manifest)
+            self._manifest = None
+            for bbm in entries:
+                self._remove_superseded(source, month, bbm, manifest)
+        return written
@@ -0,0 +1,150 @@
+"""Lightweight per-stage timings and counters for the dashboard.
+
+One ``Metrics`` object per server process collects
+
+* stage timings: ``with metrics.stage("preprocess"): ...`` (count, total,
+  max seconds per stage name), and
+* counters: ``metrics.inc("status_writes")``.
+
+A disabled ``Metrics`` hands out a shared no-op context manager and returns
+immediately from ``inc`` / ``observe``, so instrumented code costs one
+attribute check per call. ``prometheus_text()`` renders everything in the
+Prometheus text exposition format, which can be written to a file (for the
+node_exporter textfile collector) or served over HTTP with ``serve_http``.
+"""
+import contextlib
+import os
+import threading
+import time
+
+PREFIX = "tipos"
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "t0")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = {}    # name -> [count, total_seconds, max_seconds]
+        self._counters = {}  # name -> int
+        self.started = time.time()
+        self._last_write = 0.0
+
+    # ---- recording ----
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            s = self._stages.get(name)
+            if s is None:
+                self._stages[name] = [1, seconds, seconds]
+            else:
+                s[0] += 1
+                s[1] += seconds
+                if seconds > s[2]:
+                    s[2] = seconds
+
+    def inc(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started = time.time()
+
+    # ---- reading ----
+    def snapshot(self):
+        """({stage: (count, total_s, max_s)}, {counter: value}) copies."""
+        with self._lock:
+            stages = {k: tuple(v) for k, v in self._stages.items()}
+            counters = dict(self._counters)
+        return stages, counters
+
+    def prometheus_text(self):
+        stages, counters = self.snapshot()
+        lines = [
+            f"# HELP {PREFIX}_stage_seconds Wall time spent in each dashboard stage.",
+            f"# TYPE {PREFIX}_stage_seconds summary",
+        ]
+        for name in sorted(stages):
+            count, total, _ = stages[name]
+            lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'{PREFIX}_stage_seconds_count{{stage="{name}"}} {count}')
+        lines += [
+            f"# HELP {PREFIX}_stage_seconds_max Slowest single run of each stage.",
+            f"# TYPE {PREFIX}_stage_seconds_max gauge",
+        ]
+        for name in sorted(stages):
+            lines.append(f'{PREFIX}_stage_seconds_max{{stage="{name}"}} {stages[name][2]:.6f}')
+        for name in sorted(counters):
+            metric = f"{PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {counters[name]}")
+        lines += [
+            f"# TYPE {PREFIX}_start_time_seconds gauge",
+            f"{PREFIX}_start_time_seconds {self.started:.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    # ---- export ----
+    def write_prometheus(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+        self._last_write = time.time()
+
+    def maybe_write(self, path, min_interval=15.0):
+        """write_prometheus at most every min_interval seconds."""
+        if self.enabled and path and time.time() - self._last_write >= min_interval:
+            self.write_prometheus(path)
+
+
+def serve_http(metrics, port, host="127.0.0.1"):
+    """Serve prometheus_text() on http://host:port/metrics from a daemon
+    thread. Returns the server (call .shutdown() to stop it)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="tipos-metrics").start()
+    return server
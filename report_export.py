@@ -0,0 +1,110 @@
+"""Streaming customer report files (xlsx / csv).
+
+Reports are written straight to disk one chunk of rows at a time:
+xlsxwriter in ``constant_memory`` mode flushes every row as soon as the next
+one starts, and CSV chunks are appended with ``to_csv``. Peak memory is one
+chunk, not the whole workbook.
+
+Files live in an export directory under a name derived from a cache key
+(the caller passes dataset versions, the report scope and a digest of its
+status rows), so asking for the same report again returns the existing file.
+Reports not asked for in ``EXPORT_MAX_AGE`` seconds are removed, and never
+more than ``EXPORT_KEEP`` are kept.
+"""
+import glob
+import hashlib
+import os
+import tempfile
+import time
+
+XLSX_MAX_ROWS = 1_048_576  # Excel's sheet limit, header included
+EXPORT_KEEP = 200
+EXPORT_MAX_AGE = 24 * 3600
+
+
+def export_path(export_dir, key, ext):
+    digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:24]
+    return os.path.join(export_dir, f"report_{digest}.{ext}")
+
+
+def _rows(chunk):
+    cols = [chunk[c].astype(object).where(chunk[c].notna(), None).tolist() for c in chunk.columns]
+    return zip(*cols)
+
+
+def write_xlsx(path, sheets):
+    """sheets: [(sheet_name, columns, iterable of DataFrame chunks)]. A sheet
+    that passes Excel's row limit continues on "<name> (2)"."""
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        for name, columns, chunks in sheets:
+            part = 1
+            ws = wb.add_worksheet(name)
+            ws.write_row(0, 0, columns)
+            r = 1
+            for chunk in chunks:
+                for row in _rows(chunk[columns]):
+                    if r == XLSX_MAX_ROWS:
+                        part += 1
+                        ws = wb.add_worksheet(f"{name[:27]} ({part})")
+                        ws.write_row(0, 0, columns)
+                        r = 1
+                    ws.write_row(r, 0, row)
+                    r += 1
+    finally:
+        wb.close()
+
+
+def write_csv(path, sheets):
+    """One CSV for every sheet, with a SHEET column in front."""
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        header = True
+        for name, columns, chunks in sheets:
+            for chunk in chunks:
+                out = chunk[columns]
+                out.insert(0, "SHEET", name)
+                out.to_csv(f, header=header, index=False)
+                header = False
+
+
+def build_report(export_dir, key, ext, sheets):
+    """Path of the report for key, writing it (atomically) only if it does
+    not exist yet. Reusing a file marks it as recently used."""
+    path = export_path(export_dir, key, ext)
+    if os.path.exists(path):
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+    os.makedirs(export_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=export_dir, suffix=f".tmp.{ext}")
+    os.close(fd)
+    try:
+        (write_xlsx if ext == "xlsx" else write_csv)(tmp, sheets)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    prune_exports(export_dir)
+    return path
+
+
+def prune_exports(export_dir, keep=EXPORT_KEEP, max_age=EXPORT_MAX_AGE):
+    """Remove reports older than max_age seconds, and all but the newest keep."""
+    files = []
+    for path in glob.glob(os.path.join(export_dir, "report_*.*")):
+        try:
+            files.append((os.path.getmtime(path), path))
+        except OSError:
+            pass
+    files.sort(reverse=True)
+    cutoff = time.time() - max_age
+    for i, (mtime, path) in enumerate(files):
+        if i >= keep or mtime < cutoff:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,137 @@
+"""In-memory customer search index.
+
+Built once per dataset version from the preprocessed frames:
+
+* numbers (account, mobile, FTTH / service number) go into one sorted
+  array, so a prefix query is two binary searches (``searchsorted``);
+* names and addresses are split into upper-case word tokens with a posting
+  list (row ids) per token. Every word of a query must match the start of
+  some token of the row; the matching tokens are found by binary search in
+  the sorted vocabulary, so "ram hanam" finds "Ramesh, Hanamkonda".
+
+Rows are numbered across all the frames added; ``ref(row)`` maps a row id
+back to (source, position in that source's frame). Nothing here scans the
+frames at query time.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+_WORD = re.compile(r"\w+")
+_HIGH = "\U0010ffff"  # sorts after every real key, closes a prefix range
+MAX_PREFIX_TOKENS = 500  # vocabulary entries a short word may expand to
+
+
+def _digits(value):
+    return "".join(ch for ch in str(value) if ch.isdigit())
+
+
+def _number_keys(series):
+    """Digit strings of a column; mobiles with a country / trunk prefix are
+    also indexed on their last ten digits."""
+    keys = series.astype(str).str.replace(r"\.0$", "", regex=True).str.replace(r"\D", "", regex=True)
+    return keys, keys.where(keys.str.len() > 10, "").str[-10:]
+
+
+class CustomerIndex:
+    def __init__(self):
+        self._sources = []   # source per row
+        self._positions = []
+        self._owners = []    # e.g. TIP name per row, for owner-restricted search
+        self._num_parts = []
+        self._tok_parts = []
+        self._num_keys = np.array([], dtype=str)
+        self._num_rows = np.array([], dtype=np.int64)
+        self._vocab = np.array([], dtype=str)
+        self._postings = {}
+
+    def __len__(self):
+        return len(self._sources)
+
+    def add(self, source, df, number_cols, text_cols, owner_col=None):
+        """Index every row of df; call build() once all frames are added."""
+        base = len(self._sources)
+        n = len(df)
+        rows = np.arange(base, base + n, dtype=np.int64)
+        self._sources += [source] * n
+        self._positions += list(range(n))
+        owners = df[owner_col].astype(str).tolist() if owner_col in df.columns else [""] * n
+        self._owners += owners
+
+        for col in number_cols:
+            if col not in df.columns:
+                continue
+            for keys in _number_keys(df[col]):
+                keep = (keys != "").to_numpy()
+                self._num_parts.append((keys.to_numpy(dtype=str)[keep], rows[keep]))
+
+        for col in text_cols:
+            if col not in df.columns:
+                continue
+            text = pd.Series(df[col].to_numpy(), index=rows).astype(str).str.upper()
+            words = text.str.findall(_WORD).explode().dropna()
+            self._tok_parts.append(pd.DataFrame({
+                "TOKEN": words.to_numpy(dtype=str), "ROW": words.index.to_numpy(dtype=np.int64),
+            }))
+        return self
+
+    def build(self):
+        if self._num_parts:
+            keys = np.concatenate([k for k, _ in self._num_parts])
+            rows = np.concatenate([r for _, r in self._num_parts])
+            order = np.argsort(keys, kind="stable")
+            self._num_keys, self._num_rows = keys[order], rows[order]
+        if self._tok_parts:
+            tokens = pd.concat(self._tok_parts, ignore_index=True).drop_duplicates()
+            self._postings = {
+                tok: np.sort(grp.to_numpy(dtype=np.int64))
+                for tok, grp in tokens.groupby("TOKEN", sort=False)["ROW"]
+            }
+            self._vocab = np.array(sorted(self._postings), dtype=str)
+        self._num_parts, self._tok_parts = [], []
+        self._owners = np.array(self._owners, dtype=object)
+        return self
+
+    # ---- query ----
+    def _number_hits(self, digits):
+        lo = np.searchsorted(self._num_keys, digits, side="left")
+        hi = np.searchsorted(self._num_keys, digits + _HIGH, side="left")
+        return np.unique(self._num_rows[lo:hi])
+
+    def _token_hits(self, words):
+        hits = None
+        for word in sorted(set(words), key=len, reverse=True):  # most selective first
+            lo = np.searchsorted(self._vocab, word, side="left")
+            hi = np.searchsorted(self._vocab, word + _HIGH, side="left")
+            lists = [self._postings[t] for t in self._vocab[lo:min(hi, lo + MAX_PREFIX_TOKENS)]]
+            rows = np.unique(np.concatenate(lists)) if lists else np.array([], dtype=np.int64)
+            hits = rows if hits is None else np.intersect1d(hits, rows, assume_unique=True)
+            if not len(hits):
+                break
+        return hits if hits is not None else np.array([], dtype=np.int64)
+
+    def search(self, query, limit=50, owner=None):
+        """Row ids matching query, at most `limit`. A query of digits (3+)
+        is a prefix search on the numbers; anything else is a word search on
+        names and addresses. With owner, only that owner's rows match."""
+        query = str(query or "").strip()
+        digits = _digits(query)
+        if digits and not re.search(r"[^\d\s+\-()]", query):
+            if query.startswith("+91"):
+                digits = digits[2:]
+            if len(digits) < 3:
+                return []
+            hits = self._number_hits(digits)
+        else:
+            words = _WORD.findall(query.upper())
+            if not words:
+                return []
+            hits = self._token_hits(words)
+        if owner is not None and len(hits):
+            hits = hits[self._owners[hits] == str(owner)]
+        return hits[:limit].tolist() if limit else hits.tolist()
+
+    def ref(self, row):
+        """(source, position) of a row id."""
+        return self._sources[row], self._positions[row]
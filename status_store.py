@@ -0,0 +1,659 @@
+"""TIP contact status storage (Call Done / WA Sent log).
+
+Two interchangeable backends with the same small API:
+
+* ``SqliteStatusStore`` – embedded SQLite database in WAL mode. Every click is
+  one single-row upsert inside a transaction, so click latency does not grow
+  with history and concurrent TIPs cannot overwrite each other.
+* ``XlsxStatusStore`` – the original month-wise ``tip_contact_status.xlsx``
+  workbook, rewritten on every update. Kept for installs that want the plain
+  Excel file.
+
+Each store has a ``version`` change counter: every upserted row gets the
+next sequence number in a change log (``upsert_many`` returns the new
+value). ``changes_since(version)`` hands back just the rows written after a
+version, so caches built from the log fold those in instead of recounting.
+In SQLite the change log is a table, so writes from other server processes
+sharing the database are picked up by ``sync()`` without reloading months.
+
+Both keep a ``StatusIndex`` (hash index keyed by TIP, BBM, source and account
+number) of the months they have touched, so lookups and upserts are O(1) and
+``status_map`` copies one TIP's dict instead of filtering a frame each rerun.
+
+``contact_history`` answers cross-month questions ("how often was this
+customer chased") for a whole list of accounts at once; in SQLite it is one
+query on an (account_no, source, month) index, so it does not slow down as
+months of history pile up.
+
+``roll_over(current_month)`` retires closed months. The xlsx backend moves
+them into a read-only, compressed Parquet archive, so a click only rewrites
+the current month. SQLite keeps them in the database on purpose (the
+indexed ``contact_history`` query reads them, a click is one row whatever
+the history, and the change log is capped at ``CHANGE_LOG_KEEP`` rows); it
+only evicts them from the in-memory index.
+
+``import_xlsx`` / ``export_xlsx`` bridge between the two, using the same
+``STATUS_COLS`` layout (one sheet per month) the dashboard always wrote.
+"""
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from types import MappingProxyType
+
+import pandas as pd
+
+STATUS_COLS = [
+    "TIP_NAME_STD", "BBM_STD", "SOURCE: OS/OG", "ACCOUNT_NO",
+    "LAST_CALL_TIME", "LAST_WHATSAPP_TIME", "MONTH"
+]
+
+# STATUS_COLS -> SQLite column names
+_DB_COLS = {
+    "TIP_NAME_STD": "tip_name_std",
+    "BBM_STD": "bbm_std",
+    "SOURCE: OS/OG": "source",
+    "ACCOUNT_NO": "account_no",
+    "LAST_CALL_TIME": "last_call_time",
+    "LAST_WHATSAPP_TIME": "last_whatsapp_time",
+    "MONTH": "month",
+}
+
+# Change log rows kept for changes_since(); older readers recount instead.
+CHANGE_LOG_KEEP = 50_000
+
+
+def normalize_status_frame(df):
+    """Return df with exactly STATUS_COLS as clean strings ("" for blanks).
+
+    Older workbooks used a plain "SOURCE" header; it is accepted as
+    "SOURCE: OS/OG".
+    """
+    df = df.copy()
+    if "SOURCE: OS/OG" not in df.columns and "SOURCE" in df.columns:
+        df = df.rename(columns={"SOURCE": "SOURCE: OS/OG"})
+    for c in STATUS_COLS:
+        if c not in df.columns:
+            df[c] = ""
+    df = df[STATUS_COLS].astype(object).where(df[STATUS_COLS].notna(), "")
+    return df.astype(str).apply(lambda col: col.str.strip())
+
+
+def _history(rows):
+    """(account, month, call, wa) rows sorted by account, month -> {account: [...]}.
+    A customer listed under two TIPs in one month keeps the latest times."""
+    out = {}
+    for acc, month, call, wa in rows:
+        entries = out.setdefault(acc, [])
+        if entries and entries[-1][0] == month:
+            _, old_call, old_wa = entries[-1]
+            entries[-1] = (month, max(call, old_call), max(wa, old_wa))
+        else:
+            entries.append((month, call, wa))
+    return out
+
+
+def _key(tip_name, bbm_name, source, account_no):
+    return (
+        str(tip_name).upper().strip(),
+        str(bbm_name).upper().strip(),
+        str(source).upper().strip(),
+        str(account_no).strip(),
+    )
+
+
+class StatusIndex:
+    """Month -> (TIP, BBM, source) -> {account_no: (call_time, wa_time)}.
+
+    The innermost dicts double as the per-TIP status maps: ``group()`` returns
+    a read-only snapshot of one (a dict copy, taken under the store lock, so
+    callers can iterate it while other sessions write). ``counts()``
+    keeps per-group called / WhatsApped / contacted totals, counted once per
+    month and then adjusted by every ``apply()``.
+    """
+
+    def __init__(self):
+        self._months = {}
+        self._counts = {}  # month -> {(tip, bbm, src): [called, whatsapped, contacted]}
+
+    def has_month(self, month):
+        return str(month) in self._months
+
+    def months(self):
+        return sorted(self._months)
+
+    def add_month(self, month, rows=()):
+        """rows: iterable of (tip, bbm, source, account_no, call_time, wa_time)."""
+        groups = self._months.setdefault(str(month), {})
+        for tip, bbm, src, acc, call, wa in rows:
+            groups.setdefault((tip, bbm, src), {})[acc] = (call or "", wa or "")
+        self._counts.pop(str(month), None)
+
+    def drop_month(self, month):
+        self._months.pop(str(month), None)
+        self._counts.pop(str(month), None)
+
+    def get(self, month, tip, bbm, src, acc):
+        return self._months.get(str(month), {}).get((tip, bbm, src), {}).get(acc)
+
+    def apply(self, month, tip, bbm, src, acc, call="", wa=""):
+        """Merge non-empty timestamps into the row; returns the stored tuple."""
+        group = self._months.setdefault(str(month), {}).setdefault((tip, bbm, src), {})
+        old_call, old_wa = group.get(acc, ("", ""))
+        row = (call or old_call, wa or old_wa)
+        group[acc] = row
+        counts = self._counts.get(str(month))
+        if counts is not None:
+            c = counts.setdefault((tip, bbm, src), [0, 0, 0])
+            c[0] += bool(row[0]) - bool(old_call)
+            c[1] += bool(row[1]) - bool(old_wa)
+            c[2] += bool(row[0] or row[1]) - bool(old_call or old_wa)
+        return row
+
+    def counts(self, month):
+        """{(tip, bbm, src): (called, whatsapped, contacted)} for month."""
+        month = str(month)
+        counts = self._counts.get(month)
+        if counts is None:
+            counts = {}
+            for key, accounts in self._months.get(month, {}).items():
+                c = [0, 0, 0]
+                for call, wa in accounts.values():
+                    c[0] += bool(call)
+                    c[1] += bool(wa)
+                    c[2] += bool(call or wa)
+                counts[key] = c
+            self._counts[month] = counts
+        return {k: tuple(v) for k, v in counts.items()}
+
+    def group(self, month, tip, bbm, src):
+        groups = self._months.setdefault(str(month), {})
+        return MappingProxyType(dict(groups.get((tip, bbm, src), {})))
+
+    def rows(self, month):
+        for (tip, bbm, src), accounts in self._months.get(str(month), {}).items():
+            for acc, (call, wa) in accounts.items():
+                yield tip, bbm, src, acc, call, wa
+
+    def frame(self, month):
+        return pd.DataFrame(
+            [(tip, bbm, src, acc, call, wa, str(month))
+             for tip, bbm, src, acc, call, wa in self.rows(month)],
+            columns=STATUS_COLS,
+        )
+
+
+class SqliteStatusStore:
+    backend = "sqlite"
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Streamlit serves sessions from several threads; access is serialised
+        # through self._lock.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS contact_status (
+                month              TEXT NOT NULL,
+                tip_name_std       TEXT NOT NULL,
+                bbm_std            TEXT NOT NULL,
+                source             TEXT NOT NULL,
+                account_no         TEXT NOT NULL,
+                last_call_time     TEXT NOT NULL DEFAULT '',
+                last_whatsapp_time TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (month, tip_name_std, bbm_std, source, account_no)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS contact_status_by_account "
+            "ON contact_status (account_no, source, month)"
+        )
+        # One row per upserted customer; seq is the store version that write
+        # produced.
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS status_changes (
+                seq                INTEGER PRIMARY KEY AUTOINCREMENT,
+                month              TEXT NOT NULL,
+                tip_name_std       TEXT NOT NULL DEFAULT '',
+                bbm_std            TEXT NOT NULL DEFAULT '',
+                source             TEXT NOT NULL DEFAULT '',
+                account_no         TEXT NOT NULL DEFAULT '',
+                last_call_time     TEXT NOT NULL DEFAULT '',
+                last_whatsapp_time TEXT NOT NULL DEFAULT ''
+            )
+            """
+        )
+        self._conn.commit()
+        self._index = StatusIndex()
+        self.version = self._max_seq()
+
+    def _max_seq(self):
+        row = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM status_changes").fetchone()
+        return int(row[0])
+
+    def _sync_locked(self):
+        """Fold change-log rows newer than self.version into the index
+        (caller holds the lock)."""
+        rows = self._conn.execute(
+            "SELECT seq, month, tip_name_std, bbm_std, source, account_no, "
+            "last_call_time, last_whatsapp_time FROM status_changes WHERE seq > ? ORDER BY seq",
+            (self.version,),
+        ).fetchall()
+        for seq, month, tip, bbm, src, acc, call, wa in rows:
+            if self._index.has_month(month):
+                self._index.apply(month, tip, bbm, src, acc, call, wa)
+        if rows:
+            self.version = rows[-1][0]
+        return self.version
+
+    def sync(self):
+        """Pick up writes made by other processes since this one last looked.
+        One indexed query; returns the current version."""
+        with self._lock:
+            return self._sync_locked()
+
+    def _ensure_month(self, month):
+        """Load one month into the index on first use (caller holds the lock)."""
+        if self._index.has_month(month):
+            return
+        rows = self._conn.execute(
+            "SELECT tip_name_std, bbm_std, source, account_no, last_call_time, last_whatsapp_time "
+            "FROM contact_status WHERE month = ?",
+            (str(month),),
+        ).fetchall()
+        self._index.add_month(month, rows)
+
+    def is_empty(self):
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM contact_status LIMIT 1").fetchone()
+        return row is None
+
+    def upsert(self, tip_name, bbm_name, source, account_no, month,
+               call_time="", whatsapp_time=""):
+        """Insert the row or update only the timestamps that were given."""
+        return self.upsert_many([(tip_name, bbm_name, source, account_no, month, call_time, whatsapp_time)])
+
+    def upsert_many(self, rows):
+        """rows: iterable of (tip, bbm, source, account_no, month, call_time, wa_time)."""
+        params = [
+            (str(month),) + _key(tip, bbm, src, acc) + (str(call or ""), str(wa or ""))
+            for tip, bbm, src, acc, month, call, wa in rows
+        ]
+        if not params:
+            return self.version
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO contact_status
+                    (month, tip_name_std, bbm_std, source, account_no,
+                     last_call_time, last_whatsapp_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (month, tip_name_std, bbm_std, source, account_no) DO UPDATE SET
+                    last_call_time = CASE WHEN excluded.last_call_time <> ''
+                        THEN excluded.last_call_time ELSE contact_status.last_call_time END,
+                    last_whatsapp_time = CASE WHEN excluded.last_whatsapp_time <> ''
+                        THEN excluded.last_whatsapp_time ELSE contact_status.last_whatsapp_time END
+                """,
+                params,
+            )
+            self._conn.executemany(
+                "INSERT INTO status_changes (month, tip_name_std, bbm_std, source, account_no, "
+                "last_call_time, last_whatsapp_time) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                params,
+            )
+            before = self.version
+            version = self._sync_locked()
+            if version // 1000 != before // 1000:
+                self._conn.execute(
+                    "DELETE FROM status_changes WHERE seq <= ?", (version - CHANGE_LOG_KEEP,)
+                )
+            return version
+
+    def changes_since(self, version, bbm_name=None):
+        """(current_version, rows) with rows = [(seq, month, tip, bbm, source,
+        account_no, call_time, wa_time), ...] written after `version`,
+        optionally for one BBM. rows is None when the log cannot answer
+        (`version` is older than the kept log); the caller should then
+        rebuild from the store."""
+        version = int(version)
+        with self._lock:
+            current = self._sync_locked()
+            oldest = self._conn.execute("SELECT MIN(seq) FROM status_changes").fetchone()[0]
+            if version < current and (oldest is None or version < oldest - 1):
+                return current, None
+            sql = (
+                "SELECT seq, month, tip_name_std, bbm_std, source, account_no, last_call_time, "
+                "last_whatsapp_time FROM status_changes WHERE seq > ?"
+            )
+            args = [version]
+            if bbm_name is not None:
+                sql += " AND bbm_std = ?"
+                args.append(str(bbm_name).upper().strip())
+            rows = self._conn.execute(sql + " ORDER BY seq", args).fetchall()
+        return current, rows
+
+    def get(self, tip_name, bbm_name, source, account_no, month):
+        """(call_time, wa_time) for one customer, or None."""
+        with self._lock:
+            self._ensure_month(month)
+            return self._index.get(month, *_key(tip_name, bbm_name, source, account_no))
+
+    def status_map(self, tip_name, bbm_name, source, month):
+        """Read-only snapshot {account_no: (call_time, wa_time)} for one TIP."""
+        tip, bbm, src, _ = _key(tip_name, bbm_name, source, "")
+        with self._lock:
+            self._ensure_month(month)
+            return self._index.group(month, tip, bbm, src)
+
+    def contact_counts(self, month):
+        """{(tip, bbm, source): (called, whatsapped, contacted)} for month."""
+        with self._lock:
+            self._ensure_month(month)
+            return self._index.counts(month)
+
+    def contact_history(self, source, account_nos, since_month=""):
+        """{account_no: [(month, call_time, wa_time), ...]} oldest first, for
+        months >= since_month. Rows from every TIP / BBM are included, so the
+        history follows a customer who moved between TIPs."""
+        accounts = [str(a).strip() for a in account_nos]
+        if not accounts:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT account_no, month, last_call_time, last_whatsapp_time
+                FROM contact_status
+                WHERE account_no IN (SELECT value FROM json_each(?))
+                  AND source = ? AND month >= ?
+                ORDER BY account_no, month
+                """,
+                (json.dumps(accounts), str(source).upper().strip(), str(since_month)),
+            ).fetchall()
+        return _history(rows)
+
+    def months(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT month FROM contact_status ORDER BY month"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def load_month(self, month):
+        cols = ", ".join(_DB_COLS[c] for c in STATUS_COLS)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {cols} FROM contact_status WHERE month = ?", (str(month),)
+            ).fetchall()
+        return pd.DataFrame(rows, columns=STATUS_COLS)
+
+    def roll_over(self, current_month):
+        """Evict every month before current_month from the in-memory index
+        (it is reloaded if asked for again). The rows stay in the database,
+        where the (account_no, source, month) index keeps contact_history
+        fast. Returns the evicted months."""
+        with self._lock:
+            closed = [m for m in self._index.months() if m < str(current_month)]
+            for month in closed:
+                self._index.drop_month(month)
+        return closed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class XlsxStatusStore:
+    """The original month-per-sheet workbook backend.
+
+    Sheets are read the first time their month is asked for (only the newest
+    one at open). A click rewrites the months still in the live workbook;
+    ``roll_over`` moves finished months out into read-only
+    Parquet files, so after a rollover the per-click cost is bounded by the
+    current month. Archived months are still loaded on demand.
+    """
+    backend = "xlsx"
+
+    def __init__(self, xlsx_path, archive_dir=None):
+        self.xlsx_path = xlsx_path
+        self.archive_dir = archive_dir or default_archive_dir(xlsx_path)
+        self._lock = threading.Lock()
+        self._index = StatusIndex()
+        self.version = 0
+        self._changes = deque(maxlen=CHANGE_LOG_KEEP)  # same rows as status_changes
+        self._live = set(_sheet_names(xlsx_path))  # months stored in the workbook
+        if self._live:
+            self._ensure_month(max(self._live))
+
+    def _ensure_month(self, month):
+        """Load one month (live sheet or archive) into the index on first use."""
+        month = str(month)
+        if self._index.has_month(month):
+            return
+        df = None
+        if month in self._live:
+            df = pd.read_excel(self.xlsx_path, sheet_name=month, dtype=str)
+        elif os.path.exists(_archive_path(self.archive_dir, month)):
+            df = pd.read_parquet(_archive_path(self.archive_dir, month))
+        self._index.add_month(month, ())
+        if df is None:
+            return
+        df = normalize_status_frame(df)
+        for tip, bbm, src, acc, call, wa in zip(
+            df["TIP_NAME_STD"], df["BBM_STD"], df["SOURCE: OS/OG"], df["ACCOUNT_NO"],
+            df["LAST_CALL_TIME"], df["LAST_WHATSAPP_TIME"],
+        ):
+            self._index.apply(month, tip, bbm, src, acc, call, wa)
+
+    def _make_live(self, month):
+        """Writing to an archived (or new) month moves it back into the workbook."""
+        month = str(month)
+        if month in self._live:
+            return
+        self._ensure_month(month)
+        self._live.add(month)
+        path = _archive_path(self.archive_dir, month)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def is_empty(self):
+        return not self.months()
+
+    def _save(self):
+        months = sorted(self._live)
+        for month in months:
+            self._ensure_month(month)
+        tmp = self.xlsx_path + ".tmp.xlsx"
+        with pd.ExcelWriter(tmp, engine="openpyxl") as writer:
+            if not months:
+                pd.DataFrame(columns=STATUS_COLS).to_excel(writer, sheet_name="Sheet1", index=False)
+            for month in months:
+                self._index.frame(month).to_excel(writer, sheet_name=month, index=False)
+        os.replace(tmp, self.xlsx_path)
+
+    def upsert(self, tip_name, bbm_name, source, account_no, month,
+               call_time="", whatsapp_time=""):
+        return self.upsert_many([(tip_name, bbm_name, source, account_no, month, call_time, whatsapp_time)])
+
+    def upsert_many(self, rows):
+        with self._lock:
+            changes = []
+            for tip, bbm, src, acc, month, call, wa in rows:
+                self._make_live(month)
+                key = _key(tip, bbm, src, acc)
+                self._index.apply(str(month), *key, call or "", wa or "")
+                changes.append((str(month),) + key + (str(call or ""), str(wa or "")))
+            if not changes:
+                return self.version
+            self._save()
+            for change in changes:
+                self.version += 1
+                self._changes.append((self.version,) + change)
+            return self.version
+
+    def sync(self):
+        """Nothing to pick up: the workbook has a single writer process."""
+        return self.version
+
+    def changes_since(self, version, bbm_name=None):
+        """Same as SqliteStatusStore.changes_since, from the in-memory log."""
+        version = int(version)
+        bbm = None if bbm_name is None else str(bbm_name).upper().strip()
+        with self._lock:
+            if version < self.version and (not self._changes or version < self._changes[0][0] - 1):
+                return self.version, None
+            rows = [c for c in self._changes if c[0] > version and (bbm is None or c[3] == bbm)]
+            return self.version, rows
+
+    def get(self, tip_name, bbm_name, source, account_no, month):
+        with self._lock:
+            self._ensure_month(month)
+            return self._index.get(month, *_key(tip_name, bbm_name, source, account_no))
+
+    def status_map(self, tip_name, bbm_name, source, month):
+        tip, bbm, src, _ = _key(tip_name, bbm_name, source, "")
+        with self._lock:
+            self._ensure_month(month)
+            return self._index.group(month, tip, bbm, src)
+
+    def contact_counts(self, month):
+        with self._lock:
+            self._ensure_month(month)
+            return self._index.counts(month)
+
+    def contact_history(self, source, account_nos, since_month=""):
+        """Same as SqliteStatusStore.contact_history (scans each month in
+        the window)."""
+        wanted = {str(a).strip() for a in account_nos}
+        src = str(source).upper().strip()
+        rows = []
+        with self._lock:
+            for month in self.months():
+                if month < str(since_month):
+                    continue
+                self._ensure_month(month)
+                for _, _, row_src, acc, call, wa in self._index.rows(month):
+                    if row_src == src and acc in wanted:
+                        rows.append((acc, month, call, wa))
+        rows.sort()
+        return _history(rows)
+
+    def months(self):
+        return sorted(self._live | set(archived_months(self.archive_dir)))
+
+    def load_month(self, month):
+        with self._lock:
+            self._ensure_month(month)
+            return self._index.frame(month)
+
+    def roll_over(self, current_month):
+        """Move every live month before current_month into the archive and
+        rewrite the workbook once. Returns the archived months."""
+        with self._lock:
+            closed = sorted(m for m in self._live if m < str(current_month))
+            for month in closed:
+                self._ensure_month(month)
+                write_archive(self._index.frame(month), self.archive_dir, month)
+                self._live.discard(month)
+                self._index.drop_month(month)
+            if closed:
+                self._save()
+            return closed
+
+    def close(self):
+        pass
+
+
+# ----------------- CLOSED-MONTH ARCHIVE -----------------
+# One zstd-compressed Parquet file per closed month, written atomically and
+# left read-only: <archive_dir>/<YYYY-MM>.parquet.
+def default_archive_dir(store_path):
+    """tip_contact_status.xlsx -> tip_contact_status_archive/"""
+    return os.path.splitext(store_path)[0] + "_archive"
+
+
+def _archive_path(archive_dir, month):
+    return os.path.join(archive_dir, f"{month}.parquet")
+
+
+def archived_months(archive_dir):
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(f[: -len(".parquet")] for f in os.listdir(archive_dir) if f.endswith(".parquet"))
+
+
+def write_archive(df, archive_dir, month):
+    os.makedirs(archive_dir, exist_ok=True)
+    path = _archive_path(archive_dir, month)
+    tmp = path + ".tmp"
+    normalize_status_frame(df).to_parquet(tmp, index=False, compression="zstd")
+    os.replace(tmp, path)
+    os.chmod(path, 0o444)
+    return path
+
+
+def _sheet_names(xlsx_path):
+    if not os.path.exists(xlsx_path):
+        return []
+    from openpyxl import load_workbook
+    wb = load_workbook(xlsx_path, read_only=True)
+    try:
+        return [s for s in wb.sheetnames if s != "Sheet1"]
+    finally:
+        wb.close()
+
+
+def import_xlsx(store, xlsx_path):
+    """Load every month sheet of a status workbook (and its closed-month
+    archive) into store.
+
+    Duplicate rows for the same customer (older workbooks appended instead of
+    updating) collapse to the latest call / WhatsApp time.
+    """
+    archive_dir = default_archive_dir(xlsx_path)
+    frames = [(m, pd.read_parquet(_archive_path(archive_dir, m))) for m in archived_months(archive_dir)]
+    if os.path.exists(xlsx_path):
+        xls = pd.ExcelFile(xlsx_path)
+        frames += [(sheet, pd.read_excel(xls, sheet_name=sheet, dtype=str)) for sheet in xls.sheet_names]
+    total = 0
+    for sheet, df in frames:
+        df = normalize_status_frame(df)
+        if df.empty:
+            continue
+        df["MONTH"] = df["MONTH"].where(df["MONTH"] != "", sheet)
+        keys = ["MONTH", "TIP_NAME_STD", "BBM_STD", "SOURCE: OS/OG", "ACCOUNT_NO"]
+        df = df.groupby(keys, as_index=False)[["LAST_CALL_TIME", "LAST_WHATSAPP_TIME"]].max()
+        store.upsert_many(
+            zip(df["TIP_NAME_STD"], df["BBM_STD"], df["SOURCE: OS/OG"], df["ACCOUNT_NO"],
+                df["MONTH"], df["LAST_CALL_TIME"], df["LAST_WHATSAPP_TIME"])
+        )
+        total += len(df)
+    return total
+
+
+def export_xlsx(store, xlsx_path):
+    """Write store back out as the month-wise workbook (one sheet per month,
+    archived months included)."""
+    months = store.months()
+    with pd.ExcelWriter(xlsx_path, engine="openpyxl") as writer:
+        if not months:
+            pd.DataFrame(columns=STATUS_COLS).to_excel(writer, sheet_name="Sheet1", index=False)
+        for month in months:
+            store.load_month(month).to_excel(writer, sheet_name=str(month)[:31], index=False)
+    return xlsx_path
+
+
+def open_status_store(backend, xlsx_path, db_path):
+    """Open the configured backend. A new SQLite database is seeded from the
+    existing xlsx workbook, so switching backends keeps the history."""
+    if backend == "xlsx":
+        return XlsxStatusStore(xlsx_path)
+    store = SqliteStatusStore(db_path)
+    if store.is_empty():
+        import_xlsx(store, xlsx_path)
+    return store
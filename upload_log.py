@@ -0,0 +1,132 @@
+"""Append-only log of BBM uploads.
+
+One JSON object per line in ``bbm_upload_log.jsonl``. Each upload is a single
+``write`` on an O_APPEND descriptor followed by ``fsync``, so records are never
+rewritten and concurrent writers cannot clobber each other. When the active
+file passes ``max_bytes`` it is renamed to
+``bbm_upload_log.<YYYYmmdd-HHMMSS-ffffff>.jsonl`` and a new one is started.
+
+All segments are read once per process into memory with small hash indexes
+by BBM, file type, month and content hash. After that, ``query()`` and
+``duplicates()`` never touch the disk, and ``append()`` keeps the indexes
+current. A torn last line (crash mid-write) is skipped on read.
+"""
+import json
+import os
+import threading
+
+import pandas as pd
+
+LOG_COLS = [
+    "UPLOADED_AT", "MONTH", "BBM_STD", "FILE_TYPE", "FILENAME",
+    "ROWS", "PARSE_SECONDS", "BYTES", "SHA256", "UPLOADED_BY",
+]
+_INDEXED = ("BBM_STD", "FILE_TYPE", "MONTH", "SHA256")
+
+
+class UploadLog:
+    def __init__(self, path, max_bytes=4 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._records = None
+        self._index = None
+
+    # ---- files ----
+    def segments(self):
+        """Rotated segments oldest first, then the active file."""
+        folder = os.path.dirname(os.path.abspath(self.path))
+        stem, ext = os.path.splitext(os.path.basename(self.path))
+        rotated = sorted(
+            f for f in os.listdir(folder)
+            if f.startswith(stem + ".") and f.endswith(ext) and f != os.path.basename(self.path)
+        ) if os.path.isdir(folder) else []
+        paths = [os.path.join(folder, f) for f in rotated]
+        if os.path.exists(self.path):
+            paths.append(self.path)
+        return paths
+
+    def _rotate_if_needed(self):
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        if size < self.max_bytes:
+            return
+        stem, ext = os.path.splitext(self.path)
+        stamp = pd.Timestamp.now().strftime("%Y%m%d-%H%M%S-%f")
+        os.replace(self.path, f"{stem}.{stamp}{ext}")
+
+    def _load(self):
+        """Read every segment once (caller holds the lock)."""
+        if self._records is not None:
+            return
+        self._records = []
+        self._index = {col: {} for col in _INDEXED}
+        for path in self.segments():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._add(record)
+
+    def _add(self, record):
+        pos = len(self._records)
+        self._records.append(record)
+        for col in _INDEXED:
+            self._index[col].setdefault(str(record.get(col, "")), []).append(pos)
+
+    # ---- write ----
+    def append(self, record):
+        """Durably append one upload (a dict with LOG_COLS keys)."""
+        record = {c: record.get(c, "") for c in LOG_COLS}
+        line = (json.dumps(record, ensure_ascii=False, sort_keys=True) + "\n").encode("utf-8")
+        with self._lock:
+            self._load()
+            self._rotate_if_needed()
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._add(record)
+        return record
+
+    # ---- read ----
+    def query(self, bbm=None, file_type=None, month=None, sha256=None):
+        """Records matching every given filter, oldest first."""
+        filters = [
+            (col, str(value).upper().strip() if col == "BBM_STD" else str(value))
+            for col, value in (("BBM_STD", bbm), ("FILE_TYPE", file_type),
+                               ("MONTH", month), ("SHA256", sha256))
+            if value is not None
+        ]
+        with self._lock:
+            self._load()
+            if not filters:
+                return list(self._records)
+            hits = None
+            for col, value in filters:
+                positions = set(self._index[col].get(value, ()))
+                hits = positions if hits is None else hits & positions
+            return [self._records[p] for p in sorted(hits)]
+
+    def duplicates(self, sha256):
+        """Earlier uploads with the same content hash."""
+        return self.query(sha256=sha256) if sha256 else []
+
+    def frame(self, **filters):
+        return pd.DataFrame(self.query(**filters), columns=LOG_COLS)
+
+
+def import_xlsx_log(log, xlsx_path):
+    """One-time copy of the old bbm_upload_log.xlsx into the append-only log."""
+    if not os.path.exists(xlsx_path):
+        return 0
+    df = pd.read_excel(xlsx_path, dtype=str).fillna("")
+    for record in df.to_dict("records"):
+        log.append(record)
+    return len(df)